@@ -20,46 +20,81 @@ Example:
 """
 
 import os
-
+import re
+import threading
+import time
+import sys
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterator
+from typing import Any
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
 import telebot
-from telebot import types
+from telebot import apihelper, custom_filters, types
 from dotenv import load_dotenv
 
 import atexit
+import functools
+import hashlib
+import hmac
+import io
 import logging
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+import logging.handlers
+import queue
+import secrets
+from urllib.parse import urlsplit
+
+# Настройка логирования: хендлеры пишут в очередь, вывод в stderr — в фоновом потоке QueueListener
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_output = logging.StreamHandler()
+_log_output.setFormatter(logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S',
+))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_output, respect_handler_level=True)
+_log_input = logging.handlers.QueueHandler(_log_queue)
+_log_input.setFormatter(logging.Formatter('%(message)s'))  # Итоговый формат применяет _log_output
+logging.basicConfig(level=logging.INFO, handlers=[_log_input])
+_log_listener.start()
+# Остановка слушателя дописывает оставшиеся в очереди записи
+atexit.register(_log_listener.stop)
+# У telebot свой синхронный StreamHandler: снимаем его, записи идут в общую очередь через root
+telebot.logger.removeHandler(telebot.console_output_handler)
 logger = logging.getLogger(__name__)
 
-from pipeline import ensure_directories, process_article, save_article_to_db
+from pipeline import ensure_directories, get_source_name, process_article, save_article_to_db
+from scraper import SUPPORTED_SOURCES
 from summarizer import (
     DEFAULT_MODEL, DEFAULT_PROVIDER, check_model_availability, check_providers_status,
     DEFAULT_MD_MODEL, DEFAULT_MD_PROVIDER,
-    generate_idea_md, revise_idea_md,
+    generate_idea_md_stream, revise_idea_md,
 )
 from database import (
     init_db,
     article_exists,
     get_cached_summary,
-    get_article_by_id,
+    get_article_summary,
     create_idea,
     get_user_ideas,
     get_idea_by_id,
     update_idea,
     delete_idea,
     delete_article,
-    link_article_to_idea,
-    unlink_article_from_idea,
-    get_articles_by_idea,
+    get_article_owner,
+    link_article_to_ideas,
+    reassign_article,
+    unlink_and_fetch_articles,
+    get_idea_with_articles,
     get_user_articles,
-    get_ideas_by_article,
+    get_article_ideas_map,
     get_idea_md,
     update_idea_md,
+    get_user_model_config,
+    get_user_model_configs,
+    set_user_model_config,
 )
 
 load_dotenv()
@@ -69,24 +104,89 @@ __all__ = ['bot', 'main']
 # Конфигурация
 TELEGRAM_TOKEN: str | None = os.getenv('TELEGRAM_BOT_TOKEN')
 
+# Webhook: если WEBHOOK_URL не задан (или задан USE_POLLING) — используется long polling
+WEBHOOK_URL: str | None = os.getenv('WEBHOOK_URL')  # Публичный адрес, например https://example.com
+# TLS завершается на reverse proxy, поэтому по умолчанию сервер слушает только localhost
+WEBHOOK_HOST: str = os.getenv('WEBHOOK_HOST', '127.0.0.1')
+WEBHOOK_PORT: int = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH: str = os.getenv('WEBHOOK_PATH', '/webhook')
+# Без секрета любой, кто достучится до порта, сможет прислать Update от имени чужого user_id.
+# Если не задан — генерируется при старте и передаётся в set_webhook() (webhook регистрируется заново при запуске)
+WEBHOOK_SECRET: str = os.getenv('WEBHOOK_SECRET') or secrets.token_urlsafe(32)
+USE_POLLING: bool = bool(os.getenv('USE_POLLING'))
+
 # Константы Telegram
 TELEGRAM_MAX_MESSAGE_LENGTH = 4096  # Максимальная длина одного сообщения в Telegram
 MESSAGE_CHUNK_SIZE = 4000  # Размер части при разбивке длинных сообщений (оставляем запас)
-
-# Словарь поддерживаемых источников: domain → имя парсера
-SUPPORTED_SOURCES: dict[str, str] = {
-    'habr.com': 'habr',
-    'github.com': 'github',
-    'infostart.ru': 'infostart',
+TELEGRAM_MAX_CAPTION_LENGTH = 1024  # Максимальная длина подписи к файлу
+SUMMARY_DOCUMENT_THRESHOLD = 16_000  # Конспект длиннее отправляется одним файлом, а не 4+ сообщениями
+TELEGRAM_CONNECT_TIMEOUT = 5  # Таймаут установки соединения с api.telegram.org, сек
+TELEGRAM_READ_TIMEOUT = 30  # Таймаут чтения ответа Telegram API, сек
+TELEGRAM_POOL_SIZE = 16  # Максимум keep-alive соединений в пуле (по числу потоков telebot с запасом)
+TELEGRAM_GLOBAL_RATE = 30.0  # Лимит Telegram: ~30 сообщений/сек на бота
+TELEGRAM_CHAT_RATE = 1.0  # Лимит Telegram: ~1 сообщение/сек в один чат
+TELEGRAM_CHAT_BURST = 3  # Допустимый всплеск сообщений в один чат (части длинного конспекта)
+TELEGRAM_MAX_RETRIES = 3  # Повторы отправки при ответе 429 Too Many Requests
+TYPING_REFRESH_INTERVAL = 4.5  # Индикатор «печатает» гаснет через 5 сек — обновляем чуть раньше
+TOGGLE_EDIT_DEBOUNCE = 0.15  # Пауза после нажатия галочки, за которую серия нажатий даёт одно обновление, сек
+MD_STREAM_EDIT_INTERVAL = 1.0  # Как часто обновлять сообщение с .md, пока модель его генерирует, сек
+
+# Количество статей, обрабатываемых параллельно (парсинг + LLM)
+PIPELINE_WORKERS: int = int(os.getenv('PIPELINE_WORKERS', '4'))
+# Потоки telebot для обработчиков обновлений (по умолчанию в telebot — 2)
+TELEGRAM_HANDLER_THREADS = 8
+# Потоки для фоновых вызовов Telegram API (удаление статусных сообщений)
+TELEGRAM_BACKGROUND_WORKERS = 4
+# Кеш готовых конспектов в памяти: повторный URL с той же моделью не идёт в LLM
+SUMMARY_CACHE_TTL = 3600.0  # Время жизни записи, сек
+SUMMARY_CACHE_SIZE = 1024  # Максимум записей, при превышении вытесняются самые старые
+
+# Ограничения длины для регулярок по тексту пользователя: все квантификаторы конечны,
+# поэтому время поиска не растёт катастрофически на специально подобранных сообщениях
+URL_MAX_LENGTH = 2048  # Более длинные «ссылки» не считаются URL
+HOSTNAME_MAX_LENGTH = 253  # Максимальная длина доменного имени по RFC 1035
+# URL в тексте сообщения: слово, начинающееся с http:// или https://
+URL_RE: re.Pattern[str] = re.compile(rf'(?<!\S)https?://\S{{1,{URL_MAX_LENGTH}}}(?!\S)')
+# Ссылка на поддерживаемый источник: URL и домен из SUPPORTED_SOURCES находятся одним проходом
+SUPPORTED_URL_RE: re.Pattern[str] = re.compile(
+    rf'(?<!\S)https?://(?:[^\s/?#@:]{{1,{HOSTNAME_MAX_LENGTH}}}\.)?('
+    + '|'.join(re.escape(domain) for domain in SUPPORTED_SOURCES)
+    + rf')(?::\d{{1,5}})?(?![^\s/?#])\S{{0,{URL_MAX_LENGTH}}}(?!\S)',
+    re.IGNORECASE,
+)
+URL_PREFIXES: tuple[str, str] = ('http://', 'https://')
+
+# Кеш выбора моделей из таблицы user_model_config (БД — источник истины, выбор переживает перезапуск)
+# Формат: {user_id: (model, provider)} — кортеж вместо словаря на каждого пользователя;
+# если пользователь модель не выбирал, кешируется кортеж по умолчанию
+# Хранятся в порядке последнего обращения; при превышении MAX_USER_SETTINGS вытесняются самые старые
+MAX_USER_SETTINGS = 10_000
+ModelChoice = tuple[str, str]
+user_models: OrderedDict[int, ModelChoice] = OrderedDict()
+user_md_models: OrderedDict[int, ModelChoice] = OrderedDict()
+_user_settings_lock = threading.Lock()
+# Назначение модели ('summary' | 'md', как kind в user_model_config) → кеш и значение по умолчанию
+_USER_SETTING_STORES: dict[str, OrderedDict[int, ModelChoice]] = {'summary': user_models, 'md': user_md_models}
+_USER_SETTING_DEFAULTS: dict[str, ModelChoice] = {
+    'summary': (DEFAULT_MODEL, DEFAULT_PROVIDER),
+    'md': (DEFAULT_MD_MODEL, DEFAULT_MD_PROVIDER),
 }
 
-# Формат: {user_id: {'provider': 'ollama', 'model': 'gemma3:12b'}}
-user_models: dict[int, dict[str, str]] = {}
-user_md_models: dict[int, dict[str, str]] = {}
-
-# Промежуточное состояние: провайдер выбран, ждём ввод названия модели
-# Формат: {user_id: {'purpose': 'summary'|'md', 'provider': str}}
-pending_model_selection: dict[int, dict[str, str]] = {}
+# Кеш результатов process_article(): {(url, model, provider): (истекает_в, (summary, article_data))}
+# и обработки в процессе — параллельные запросы одной статьи ждут один общий Future
+SummaryKey = tuple[str, str, str]
+_summary_cache: OrderedDict[SummaryKey, tuple[float, tuple[str, dict]]] = OrderedDict()
+_summary_inflight: dict[SummaryKey, Future] = {}
+_summary_lock = threading.Lock()
+
+# Временные состояния диалогов (pending_*): время жизни и максимум записей в каждом хранилище
+PENDING_STATE_TTL = 3600.0
+PENDING_STATE_MAX_SIZE = 10_000
+# Кеш списка идей пользователя (/ideas, выбор идей для привязки), сек;
+# изменения идей через бота сбрасывают его сразу (bump_ideas_version())
+USER_IDEAS_CACHE_TTL = 30.0
+# Число блокировок для сессий пользователей (user_id → user_id % SESSION_LOCK_STRIPES)
+SESSION_LOCK_STRIPES = 64
 
 # Примеры моделей для каждого провайдера (подсказка при вводе)
 PROVIDER_EXAMPLES: dict[str, str] = {
@@ -126,17 +226,18 @@ MSG_START: str = """👋 Привет!
 💡 Попробуй отправить ссылку прямо сейчас!
 
 /help — справка по командам"""
-MSG_HELP = """Команды:
+SUPPORTED_DOMAINS_TEXT = ', '.join(SUPPORTED_SOURCES)
+MSG_HELP = f"""Команды:
 /start - начало
 /model - выбор модели
 /new_idea - создать идею
 /ideas - посмотреть идеи
 /articles - все статьи
 
-Поддерживаемые источники: habr.com, github.com, infostart.ru"""
+Поддерживаемые источники: {SUPPORTED_DOMAINS_TEXT}"""
 MSG_PROCESSING = "Обрабатываю..."
 MSG_ERROR = "Ошибка: {error}"
-MSG_UNSUPPORTED = "Я такие ссылки пока не понимаю. Поддерживаемые источники: habr.com, github.com, infostart.ru"
+MSG_UNSUPPORTED = f"Я такие ссылки пока не понимаю. Поддерживаемые источники: {SUPPORTED_DOMAINS_TEXT}"
 MSG_MODEL_UNAVAILABLE = "Модель {model} ({provider}) недоступна: {error}\n\nВыбери другую модель: /model"
 MSG_UNKNOWN = "Без ссылки работать бессмысленно. /help для справки."
 MSG_CURRENT_MODELS = ("Текущие настройки:\n"
@@ -183,6 +284,7 @@ MSG_MD_READY = ("Описание готово. Варианты:\n1. Утвер
                 "3. Отправить свой вариант целиком (начиная с #)")
 MSG_MD_APPROVED = "Описание сохранено."
 MSG_MD_REVISING = "Переделываю с учетом замечаний..."
+MSG_MD_REVISION_IN_PROGRESS = "Предыдущие замечания ещё обрабатываются, дождись результата."
 
 
 # Проверяем наличие токена перед запуском
@@ -191,34 +293,417 @@ if not TELEGRAM_TOKEN:
     logger.critical('Создайте файл .env и добавьте строку: TELEGRAM_BOT_TOKEN=ваш_токен_от_BotFather')
     exit(1)
 
+
+class TokenBucket:
+    """
+    Потокобезопасный token bucket.
+
+    Токены пополняются со скоростью rate в секунду, в запасе не более capacity.
+    Токен резервируется сразу (баланс может уйти в минус), поэтому конкурентные
+    отправители выстраиваются в очередь, а не будят друг друга.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Резервирует токен и возвращает, сколько секунд нужно подождать до отправки."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self._rate
+
+    def is_full(self) -> bool:
+        """True, если запас пополнился до capacity: такой bucket не отличается от нового."""
+        with self._lock:
+            return self._tokens + (time.monotonic() - self._updated) * self._rate >= self._capacity
+
+
+class SessionStore:
+    """
+    Потокобезопасное хранилище временных состояний с ограничением размера и времени жизни.
+
+    Запись живёт ttl секунд с момента записи; сверх maxsize вытесняются самые
+    старые. Поддерживает те операции dict, которыми пользуются обработчики:
+    store[key], store[key] = value, key in store, get(), pop().
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = PENDING_STATE_MAX_SIZE, ttl: float = PENDING_STATE_TTL) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (now + self._ttl, value)
+            self._data.move_to_end(key)
+            # Записи упорядочены по времени записи, поэтому просроченные и лишние — в начале
+            while self._data:
+                expires_at, _ = next(iter(self._data.values()))
+                if expires_at > now and len(self._data) <= self._maxsize:
+                    break
+                self._data.popitem(last=False)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            if item[0] <= time.monotonic():
+                del self._data[key]
+                return default
+            return item[1]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+        if item is None or item[0] <= time.monotonic():
+            return default
+        return item[1]
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, self._MISSING)
+        if value is self._MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, self._MISSING) is not self._MISSING
+
+
+class RateLimitedTeleBot(telebot.TeleBot):
+    """
+    TeleBot с упреждающим ограничением частоты send_message, send_document и edit_message_text.
+
+    Перед вызовом ждёт токен из глобального bucket (лимит на бота) и bucket
+    чата (лимит на чат). При 429 ждёт retry_after из ответа Telegram и повторяет.
+    reply_to() тоже проходит через send_message. Правка inline-сообщения
+    (без chat_id) ограничивается только глобальным bucket.
+
+    Bucket чатов хранятся в порядке последней отправки; давно не использованные
+    и успевшие пополниться удаляются, поэтому словарь не растёт с числом чатов.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._global_bucket = TokenBucket(TELEGRAM_GLOBAL_RATE, TELEGRAM_GLOBAL_RATE)
+        self._chat_buckets: OrderedDict[int | str, TokenBucket] = OrderedDict()
+        self._chat_buckets_lock = threading.Lock()
+
+    def _throttle(self, chat_id: int | str | None) -> None:
+        """Блокирует поток, пока отправка в chat_id не уложится в лимиты."""
+        if chat_id is None:
+            delay = self._global_bucket.reserve()
+            if delay > 0:
+                time.sleep(delay)
+            return
+        with self._chat_buckets_lock:
+            # Резерв под той же блокировкой, что и удаление: отправитель не может взять уже удалённый bucket
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = TokenBucket(TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST)
+                self._chat_buckets[chat_id] = bucket
+            else:
+                self._chat_buckets.move_to_end(chat_id)
+            chat_delay = bucket.reserve()
+            while self._chat_buckets:
+                oldest_id, oldest = next(iter(self._chat_buckets.items()))
+                if oldest_id == chat_id or not oldest.is_full():
+                    break
+                del self._chat_buckets[oldest_id]
+        delay = max(chat_delay, self._global_bucket.reserve())
+        if delay > 0:
+            time.sleep(delay)
+
+    def _call_limited(self, chat_id: int | str | None, method: Callable[..., Any], /, *args, **kwargs) -> Any:
+        """Вызывает method(*args, **kwargs) в пределах лимитов chat_id, повторяя его при 429."""
+        for attempt in range(TELEGRAM_MAX_RETRIES + 1):
+            self._throttle(chat_id)
+            try:
+                return method(*args, **kwargs)
+            except apihelper.ApiTelegramException as e:
+                if e.error_code != 429 or attempt == TELEGRAM_MAX_RETRIES:
+                    raise
+                retry_after = (e.result_json.get('parameters') or {}).get('retry_after', 1)
+                logger.warning('Telegram 429 для chat_id=%s, жду %s сек', chat_id, retry_after)
+                time.sleep(retry_after)
+
+    def send_message(self, chat_id: int | str, *args, **kwargs) -> types.Message:
+        return self._call_limited(chat_id, super().send_message, chat_id, *args, **kwargs)
+
+    def send_document(self, chat_id: int | str, document: Any, *args, **kwargs) -> types.Message:
+        # Файл вычитывается при каждой попытке: перед повтором после 429 возвращаемся в его начало
+        file = document.file if isinstance(document, types.InputFile) else document
+        start = file.tell() if hasattr(file, 'seek') else None
+
+        def send(*send_args, **send_kwargs) -> types.Message:
+            if start is not None:
+                file.seek(start)
+            return super(RateLimitedTeleBot, self).send_document(*send_args, **send_kwargs)
+
+        return self._call_limited(chat_id, send, chat_id, document, *args, **kwargs)
+
+    def edit_message_text(self, text: str, *args, **kwargs) -> types.Message | bool:
+        # chat_id передаётся и позиционно (text, chat_id, message_id), и именованным аргументом
+        chat_id = kwargs.get('chat_id', args[0] if args else None)
+        return self._call_limited(chat_id, super().edit_message_text, text, *args, **kwargs)
+
+
+# Общая HTTP-сессия для всех вызовов Telegram API: keep-alive вместо нового TLS-рукопожатия на каждый запрос
+apihelper.session = requests.Session()
+apihelper.session.mount(
+    'https://',
+    requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=TELEGRAM_POOL_SIZE),
+)
+apihelper.CONNECT_TIMEOUT = TELEGRAM_CONNECT_TIMEOUT
+apihelper.READ_TIMEOUT = TELEGRAM_READ_TIMEOUT
+
 # Создаем бота (токен точно существует)
-bot = telebot.TeleBot(TELEGRAM_TOKEN)
+bot = RateLimitedTeleBot(TELEGRAM_TOKEN, num_threads=TELEGRAM_HANDLER_THREADS)
 
+# Пул для долгой обработки статей: потоки telebot остаются свободны для команд и кнопок
+pipeline_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix='pipeline')
 
-def extract_url(text: str | None) -> str | None:
-    """Извлекает URL из текста (пользователь может отправить текст + ссылку)."""
-    if not text:
+# Пул для вызовов Telegram API, ответ на которые обработчику не нужен
+telegram_executor = ThreadPoolExecutor(max_workers=TELEGRAM_BACKGROUND_WORKERS, thread_name_prefix='telegram')
+
+# Один поток для фоновых записей в БД: SQLite допускает одного писателя, записи идут по порядку
+db_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+
+
+def call_in_background(method: Callable[..., object], *args, **kwargs) -> None:
+    """
+    Выполняет вызов Telegram API в фоне, не дожидаясь ответа.
+
+    Используется для служебных вызовов (например, delete_message),
+    чтобы их сетевой round-trip шёл параллельно с основной работой обработчика.
+    Ошибки только логируются.
+    """
+    def run() -> None:
+        try:
+            method(*args, **kwargs)
+        except Exception as e:
+            logger.warning('Фоновый вызов %s не выполнен: %s', getattr(method, '__name__', method), e)
+
+    telegram_executor.submit(run)
+
+
+# Отложенные обновления клавиатур multiselect: {(chat_id, message_id): Timer}
+_pending_markup_edits: dict[tuple[int, int], threading.Timer] = {}
+_pending_markup_edits_lock = threading.Lock()
+
+
+def edit_reply_markup_debounced(
+    chat_id: int,
+    message_id: int,
+    build_keyboard: Callable[[], types.InlineKeyboardMarkup | None],
+) -> None:
+    """
+    Обновляет клавиатуру сообщения через TOGGLE_EDIT_DEBOUNCE секунд после последнего вызова.
+
+    Серия быстрых нажатий галочек даёт один edit_message_reply_markup с итоговым
+    состоянием: клавиатура строится build_keyboard() в момент отправки. Если
+    build_keyboard() вернула None (сессия уже закрыта или клавиатура не изменилась),
+    обновление не отправляется.
+    """
+    key = (chat_id, message_id)
+
+    def run() -> None:
+        with _pending_markup_edits_lock:
+            if _pending_markup_edits.get(key) is not timer:
+                return
+            del _pending_markup_edits[key]
+        keyboard = build_keyboard()
+        if keyboard is None:
+            return
+        try:
+            bot.edit_message_reply_markup(chat_id, message_id, reply_markup=keyboard)
+        except Exception as e:
+            logger.warning('Не удалось обновить клавиатуру в chat_id=%s: %s', chat_id, e)
+
+    timer = threading.Timer(TOGGLE_EDIT_DEBOUNCE, run)
+    timer.daemon = True
+    with _pending_markup_edits_lock:
+        previous = _pending_markup_edits.get(key)
+        if previous is not None:
+            previous.cancel()
+        _pending_markup_edits[key] = timer
+    timer.start()
+
+
+def cancel_markup_edit(chat_id: int, message_id: int) -> None:
+    """Отменяет отложенное обновление клавиатуры (сессия multiselect завершена)."""
+    with _pending_markup_edits_lock:
+        timer = _pending_markup_edits.pop((chat_id, message_id), None)
+    if timer is not None:
+        timer.cancel()
+
+
+def write_in_background(func: Callable[..., object], *args) -> None:
+    """
+    Выполняет запись в БД в потоке db_write_executor, не задерживая ответ пользователю.
+
+    Используется там, где результат записи обработчику не нужен. Ошибки только логируются.
+    """
+    def run() -> None:
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error('Фоновая запись %s не выполнена: %s', func.__name__, e)
+
+    db_write_executor.submit(run)
+
+
+@contextmanager
+def typing_action(chat_id: int) -> Iterator[None]:
+    """
+    Показывает «печатает» в чате, пока выполняется блок with.
+
+    Индикатор отправляется из отдельного потока сразу и обновляется каждые
+    TYPING_REFRESH_INTERVAL секунд, поэтому не задерживает сам блок и не гаснет
+    на долгой генерации. Ошибки отправки только логируются.
+    """
+    stop = threading.Event()
+
+    def refresh() -> None:
+        while True:
+            try:
+                bot.send_chat_action(chat_id, 'typing')
+            except Exception as e:
+                logger.warning('Не удалось отправить typing в chat_id=%s: %s', chat_id, e)
+            if stop.wait(TYPING_REFRESH_INTERVAL):
+                return
+
+    threading.Thread(target=refresh, name='typing', daemon=True).start()
+    try:
+        yield
+    finally:
+        stop.set()
+
+
+def _peek_summary_cache(key: SummaryKey) -> tuple[str, dict] | None:
+    """Возвращает непросроченный результат из _summary_cache. Вызывается под _summary_lock."""
+    cached = _summary_cache.get(key)
+    if cached is None or cached[0] <= time.monotonic():
         return None
-    for word in text.split():
-        word = word.strip()
-        if word.startswith('http://') or word.startswith('https://'):
-            return word
-    return None
+    _summary_cache.move_to_end(key)
+    return cached[1]
 
 
-def is_supported_url(url: str) -> bool:
+def process_article_cached(
+    url: str,
+    model: str,
+    provider: str,
+    user_id: int,
+    source: str | None = None,
+    skip_cache: bool = False,
+) -> tuple[str, dict] | None:
     """
-    Проверяет, поддерживается ли источник по URL.
+    Обёртка над process_article() с кешем в памяти и объединением параллельных запросов.
 
-    Проверяет наличие доменов из SUPPORTED_SOURCES в URL.
+    Готовый результат хранится SUMMARY_CACHE_TTL секунд по ключу (url, model, provider).
+    Если та же статья с той же моделью уже обрабатывается, вызов ждёт её результат
+    вместо повторного парсинга и обращения к LLM.
 
     Args:
-        url: URL для проверки
+        url: URL статьи
+        model: модель для генерации
+        provider: провайдер модели
+        user_id: ID пользователя
+        source: источник, уже определённый через get_source_name()
+        skip_cache: не брать результат из кеша (перегенерация); новый результат всё равно сохраняется
 
     Returns:
-        True если источник поддерживается, иначе False
+        Кортеж (summary, article_data) или None при ошибке.
+    """
+    key = (url, model, provider)
+    with _summary_lock:
+        cached = None if skip_cache else _peek_summary_cache(key)
+        if cached is not None:
+            logger.info('Конспект взят из кеша памяти: url=%s, model=%s', url, model)
+            return cached
+        future = _summary_inflight.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            _summary_inflight[key] = future
+
+    if not is_owner:
+        logger.info('Статья уже обрабатывается, жду результат: url=%s, model=%s', url, model)
+        return future.result()
+
+    try:
+        result = process_article(url, model=model, provider=provider, user_id=user_id,
+                                 skip_cache=skip_cache, source=source)
+    except Exception as e:
+        with _summary_lock:
+            _summary_inflight.pop(key, None)
+        future.set_exception(e)
+        raise
+
+    with _summary_lock:
+        _summary_inflight.pop(key, None)
+        if result is not None:
+            _summary_cache[key] = (time.monotonic() + SUMMARY_CACHE_TTL, result)
+            _summary_cache.move_to_end(key)
+            while len(_summary_cache) > SUMMARY_CACHE_SIZE:
+                _summary_cache.popitem(last=False)
+    future.set_result(result)
+    return result
+
+
+def extract_url(text: str | None) -> str | None:
+    """Извлекает URL из текста (пользователь может отправить текст + ссылку)."""
+    if not text:
+        return None
+    # Частый случай — сообщение начинается со ссылки: хватает одного startswith без регулярки
+    if text.startswith(URL_PREFIXES):
+        url = text.split(None, 1)[0]
+        return url if len(url) <= URL_MAX_LENGTH else None
+    match = URL_RE.search(text)
+    return match.group(0) if match else None
+
+
+class UrlFilter(custom_filters.SimpleCustomFilter):
     """
-    return any(source in url for source in SUPPORTED_SOURCES)
+    Фильтр сообщений со ссылкой: extracted_url=True в message_handler.
+
+    Найденный URL сохраняется в message.extracted_url, а источник — в
+    message.article_source, чтобы обработчик не разбирал текст повторно.
+    Ссылка на поддерживаемый источник находится одной регуляркой
+    SUPPORTED_URL_RE; для остальных ссылок источник определяет get_source_name().
+    """
+
+    key = 'extracted_url'
+
+    def check(self, message: telebot.types.Message) -> bool:
+        text = message.text
+        if not text:
+            return False
+        match = SUPPORTED_URL_RE.search(text)
+        if match:
+            message.extracted_url = match.group(0)
+            message.article_source = SUPPORTED_SOURCES[match.group(1).lower()]
+            return True
+        url = extract_url(text)
+        if url is None:
+            return False
+        message.extracted_url = url
+        message.article_source = get_source_name(url)
+        return True
+
+
+bot.add_custom_filter(UrlFilter())
 
 
 def get_user_model(user_id: int) -> tuple[str, str]:
@@ -231,18 +716,94 @@ def get_user_model(user_id: int) -> tuple[str, str]:
     Returns:
         Кортеж (model, provider)
     """
-    cfg = user_models.get(user_id)
-    if cfg:
-        return cfg['model'], cfg['provider']
-    return DEFAULT_MODEL, DEFAULT_PROVIDER
+    return _get_user_setting('summary', user_id)
 
 
 def get_user_md_model(user_id: int) -> tuple[str, str]:
     """Возвращает (модель, провайдер) для генерации .md."""
-    cfg = user_md_models.get(user_id)
-    if cfg:
-        return cfg['model'], cfg['provider']
-    return DEFAULT_MD_MODEL, DEFAULT_MD_PROVIDER
+    return _get_user_setting('md', user_id)
+
+
+def _get_user_setting(kind: str, user_id: int) -> ModelChoice:
+    """
+    Читает выбор модели пользователя: из кеша в памяти, при промахе — из БД.
+
+    Отсутствие настройки тоже кешируется (как модель по умолчанию), чтобы не
+    ходить в БД на каждое сообщение пользователя, который модель не выбирал.
+    """
+    store = _USER_SETTING_STORES[kind]
+    with _user_settings_lock:
+        choice = store.get(user_id)
+        if choice is not None:
+            store.move_to_end(user_id)
+            return choice
+    choice = _choice_from_config(kind, get_user_model_config(user_id, kind))
+    _cache_user_setting(store, user_id, choice)
+    return choice
+
+
+def get_user_models(user_id: int) -> tuple[ModelChoice, ModelChoice]:
+    """
+    Возвращает выбор моделей для конспектов и для .md: ((model, provider), (model, provider)).
+
+    При промахе кеша обе настройки читаются из БД одним запросом.
+    """
+    with _user_settings_lock:
+        summary_choice = user_models.get(user_id)
+        md_choice = user_md_models.get(user_id)
+        if summary_choice is not None and md_choice is not None:
+            user_models.move_to_end(user_id)
+            user_md_models.move_to_end(user_id)
+            return summary_choice, md_choice
+    configs = get_user_model_configs(user_id)
+    summary_choice = _choice_from_config('summary', configs.get('summary'))
+    md_choice = _choice_from_config('md', configs.get('md'))
+    _cache_user_setting(user_models, user_id, summary_choice)
+    _cache_user_setting(user_md_models, user_id, md_choice)
+    return summary_choice, md_choice
+
+
+def _choice_from_config(kind: str, cfg: dict | None) -> ModelChoice:
+    """Переводит строку user_model_config в (model, provider); без настройки — значение по умолчанию."""
+    if not cfg:
+        return _USER_SETTING_DEFAULTS[kind]
+    return sys.intern(cfg['model']), sys.intern(cfg['provider'])
+
+
+def _cache_user_setting(store: OrderedDict[int, ModelChoice], user_id: int, choice: ModelChoice) -> None:
+    """Кладёт настройку в кеш с вытеснением самых давних записей."""
+    with _user_settings_lock:
+        store[user_id] = choice
+        store.move_to_end(user_id)
+        while len(store) > MAX_USER_SETTINGS:
+            store.popitem(last=False)
+
+
+def set_user_model(kind: str, user_id: int, model: str, provider: str) -> None:
+    """
+    Сохраняет выбор модели пользователя в БД и в кеше.
+
+    Строки модели и провайдера интернируются: у разных пользователей
+    одинаковые значения хранятся одним объектом.
+
+    Args:
+        kind: назначение модели ('summary' или 'md')
+        user_id: Telegram ID пользователя
+        model: название модели
+        provider: провайдер модели
+    """
+    set_user_model_config(user_id, kind, provider, model)
+    _cache_user_setting(_USER_SETTING_STORES[kind], user_id, (sys.intern(model), sys.intern(provider)))
+
+
+def url_cache_key(url: str) -> str:
+    """
+    Стабильный короткий ключ URL для callback_data.
+
+    В отличие от hash(), не зависит от запуска процесса; 12 hex-символов
+    оставляют запас в лимите callback_data (64 байта).
+    """
+    return hashlib.blake2s(url.encode('utf-8'), digest_size=6).hexdigest()
 
 
 def create_cache_keyboard(url: str) -> types.InlineKeyboardMarkup:
@@ -255,11 +816,8 @@ def create_cache_keyboard(url: str) -> types.InlineKeyboardMarkup:
     Returns:
         InlineKeyboardMarkup с кнопками выбора действия
     """
-    keyboard = types.InlineKeyboardMarkup(row_width=1)
-
     # Кодируем URL для callback_data (ограничение 64 байта)
-    # Используем хеш URL для идентификации
-    url_hash = str(hash(url))[-10:]
+    url_hash = url_cache_key(url)
 
     show_btn = types.InlineKeyboardButton(
         text='📦 Показать сохранённый',
@@ -269,25 +827,49 @@ def create_cache_keyboard(url: str) -> types.InlineKeyboardMarkup:
         text='🔄 Сгенерировать заново',
         callback_data=f'cache:regen:{url_hash}',
     )
-    keyboard.add(show_btn, regen_btn)
-    return keyboard
+    return types.InlineKeyboardMarkup(keyboard=[[show_btn], [regen_btn]])
 
 
 # Временное хранилище URL по хешу (для callback)
-pending_cache_urls: dict[str, str] = {}
+pending_cache_urls = SessionStore()
 
 # Хранилище состояния multiselect для привязки статей к идеям
-# Формат: {user_id: {'article_data': dict, 'summary': str, 'model': str, 'selected_ideas': set[int]}}
-pending_article_links: dict[int, dict] = {}
+# Формат: {user_id: {'article_id': int, 'ideas': list[dict], 'ideas_version': int, 'selected_ideas': set[int]}}
+pending_article_links = SessionStore()
 
 # Хранилище состояния перепривязки статей
-pending_reassign: dict[int, dict] = {}
+pending_reassign = SessionStore()
 
 # Хранилище состояния привязки из общего списка статей
-pending_assign_list: dict[int, dict] = {}
+pending_assign_list = SessionStore()
 
 # Хранилище состояния генерации .md идей
-pending_md_generation: dict[int, dict] = {}
+pending_md_generation = SessionStore()
+
+# Версия списка идей пользователя: растёт при создании, изменении и удалении идеи.
+# Сессии multiselect хранят список идей с версией и перечитывают его из БД, только если версия устарела
+_user_ideas_version: dict[int, int] = {}
+# Кеш get_user_ideas(): {user_id: (версия, список идей)}; запись устаревшей версии не используется
+_user_ideas_cache = SessionStore(maxsize=MAX_USER_SETTINGS, ttl=USER_IDEAS_CACHE_TTL)
+
+# Промежуточное состояние: провайдер выбран, ждём ввод названия модели
+# Формат: {user_id: {'purpose': 'summary'|'md', 'provider': str}}
+pending_model_selection = SessionStore()
+
+# Блокировки сессий pending_*: фиксированный набор, пользователи распределяются по остатку от деления
+_session_locks: tuple[threading.RLock, ...] = tuple(threading.RLock() for _ in range(SESSION_LOCK_STRIPES))
+
+
+@contextmanager
+def user_session(user_id: int) -> Iterator[None]:
+    """
+    Сериализует изменения сессий пользователя из разных потоков обработчиков.
+
+    Под блокировкой выполняются только действия с сессией (выбор галочек, снятие
+    сессии, копия выбранных идей) — запросы к Telegram и БД делаются после выхода.
+    """
+    with _session_locks[user_id % SESSION_LOCK_STRIPES]:
+        yield
 
 
 def create_provider_keyboard(purpose: str) -> types.InlineKeyboardMarkup:
@@ -300,14 +882,11 @@ def create_provider_keyboard(purpose: str) -> types.InlineKeyboardMarkup:
     Returns:
         InlineKeyboardMarkup с кнопками выбора провайдера
     """
-    keyboard = types.InlineKeyboardMarkup(row_width=1)
-    for provider_id, display_name in PROVIDER_DISPLAY.items():
-        button = types.InlineKeyboardButton(
-            text=display_name,
-            callback_data=f'provider:{purpose}:{provider_id}',
-        )
-        keyboard.add(button)
-    return keyboard
+    rows = [
+        [types.InlineKeyboardButton(text=display_name, callback_data=f'provider:{purpose}:{provider_id}')]
+        for provider_id, display_name in PROVIDER_DISPLAY.items()
+    ]
+    return types.InlineKeyboardMarkup(keyboard=rows, row_width=1)
 
 
 def create_link_ideas_keyboard(
@@ -324,17 +903,14 @@ def create_link_ideas_keyboard(
     Returns:
         InlineKeyboardMarkup с toggle-кнопками идей
     """
-    keyboard = types.InlineKeyboardMarkup(row_width=1)
-
-    for idea in ideas:
-        idea_id = idea['id']
-        is_selected = idea_id in selected_ids
-        prefix = "✅ " if is_selected else "⬜ "
-        button = types.InlineKeyboardButton(
-            text=f"{prefix}{idea['name'][:40]}",
-            callback_data=f"toggle_link:{idea_id}",
-        )
-        keyboard.add(button)
+    # Строки кнопок собираются списком и передаются в конструктор разом, без add() на каждую идею
+    rows = [
+        [types.InlineKeyboardButton(
+            text=f"{'✅ ' if idea['id'] in selected_ids else '⬜ '}{idea['name'][:40]}",
+            callback_data=f"toggle_link:{idea['id']}",
+        )]
+        for idea in ideas
+    ]
 
     # Кнопки "Готово" и "Не привязывать"
     done_btn = types.InlineKeyboardButton(
@@ -345,9 +921,9 @@ def create_link_ideas_keyboard(
         text="❌ Не привязывать",
         callback_data="link_skip",
     )
-    keyboard.row(done_btn, skip_btn)
+    rows.append([done_btn, skip_btn])
 
-    return keyboard
+    return types.InlineKeyboardMarkup(keyboard=rows, row_width=1)
 
 
 def create_assign_list_keyboard(
@@ -355,32 +931,62 @@ def create_assign_list_keyboard(
     selected_ids: set[int],
 ) -> types.InlineKeyboardMarkup:
     """Клавиатура multiselect для привязки статьи из общего списка."""
-    keyboard = types.InlineKeyboardMarkup(row_width=1)
-    for idea in ideas:
-        prefix = "V " if idea['id'] in selected_ids else "_ "
-        keyboard.add(types.InlineKeyboardButton(
-            text=f"{prefix}{idea['name'][:40]}",
+    rows = [
+        [types.InlineKeyboardButton(
+            text=f"{'V ' if idea['id'] in selected_ids else '_ '}{idea['name'][:40]}",
             callback_data=f"toggle_assign_list:{idea['id']}",
-        ))
+        )]
+        for idea in ideas
+    ]
     done_btn = types.InlineKeyboardButton(text="Готово", callback_data="assign_list_done")
     cancel_btn = types.InlineKeyboardButton(text="Отмена", callback_data="assign_list_cancel")
-    keyboard.row(done_btn, cancel_btn)
-    return keyboard
+    rows.append([done_btn, cancel_btn])
+    return types.InlineKeyboardMarkup(keyboard=rows, row_width=1)
 
 
 def create_reassign_keyboard(ideas: list[dict], selected_ids: set[int]) -> types.InlineKeyboardMarkup:
     """Клавиатура multiselect для перепривязки."""
-    keyboard = types.InlineKeyboardMarkup(row_width=1)
-    for idea in ideas:
-        prefix = "V " if idea['id'] in selected_ids else "_ "
-        keyboard.add(types.InlineKeyboardButton(
-            text=f"{prefix}{idea['name'][:40]}",
+    rows = [
+        [types.InlineKeyboardButton(
+            text=f"{'V ' if idea['id'] in selected_ids else '_ '}{idea['name'][:40]}",
             callback_data=f"toggle_reassign:{idea['id']}",
-        ))
+        )]
+        for idea in ideas
+    ]
     done_btn = types.InlineKeyboardButton(text="Готово", callback_data="reassign_done")
     cancel_btn = types.InlineKeyboardButton(text="Отмена", callback_data="reassign_cancel")
-    keyboard.row(done_btn, cancel_btn)
-    return keyboard
+    rows.append([done_btn, cancel_btn])
+    return types.InlineKeyboardMarkup(keyboard=rows, row_width=1)
+
+
+def format_idea_card(idea: dict) -> str:
+    """
+    Текст карточки идеи (просмотр идеи и возврат к ней после отмены удаления).
+
+    Отправляется без parse_mode: Telegram не разбирает разметку, текст показывается как есть.
+    """
+    return f"**{idea['name']}**\n\n{idea['description'] or '(нет описания)'}"
+
+
+# Клавиатуры карточки идеи зависят только от idea_id и после создания не изменяются,
+# поэтому строятся один раз на идею
+@functools.lru_cache(maxsize=4096)
+def create_idea_keyboard(idea_id: int) -> types.InlineKeyboardMarkup:
+    """Клавиатура карточки идеи: статьи, .md, редактирование, удаление."""
+    articles_btn = types.InlineKeyboardButton(text="📚 Статьи", callback_data=f"idea_articles:{idea_id}")
+    generate_md_btn = types.InlineKeyboardButton(text="Описание (.md)", callback_data=f"gen_md:{idea_id}")
+    edit_btn = types.InlineKeyboardButton(text="✏️ Редактировать", callback_data=f"edit_idea:{idea_id}")
+    delete_btn = types.InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"delete_idea:{idea_id}")
+    return types.InlineKeyboardMarkup(keyboard=[[articles_btn, generate_md_btn], [edit_btn, delete_btn]])
+
+
+@functools.lru_cache(maxsize=4096)
+def create_confirm_delete_keyboard(idea_id: int) -> types.InlineKeyboardMarkup:
+    """Клавиатура подтверждения удаления идеи."""
+    return types.InlineKeyboardMarkup(keyboard=[
+        [types.InlineKeyboardButton(text="Да", callback_data=f"confirm_delete:{idea_id}")],
+        [types.InlineKeyboardButton(text="Отмена", callback_data=f"cancel_delete:{idea_id}")],
+    ])
 
 
 def _auto_generate_md(
@@ -390,9 +996,19 @@ def _auto_generate_md(
     idea_name: str,
     idea_description: str | None,
 ) -> None:
-    """Автоматически генерирует .md после создания/редактирования идеи."""
+    """
+    Автоматически генерирует .md после создания/редактирования идеи.
+
+    Проверка модели и генерация выполняются в пуле pipeline_executor,
+    чтобы поток обработчика telebot не ждал ответа LLM.
+    """
     if not idea_description:
         return
+    pipeline_executor.submit(_generate_md, chat_id, user_id, idea_id, idea_name, idea_description)
+
+
+def _generate_md(chat_id: int, user_id: int, idea_id: int, idea_name: str, idea_description: str) -> None:
+    """Генерирует .md идеи и отправляет черновик с кнопками утверждения. Выполняется в pipeline_executor."""
     md_model, md_provider = get_user_md_model(user_id)
     # Проверяем доступность модели для .md
     is_available, error_message = check_model_availability(md_model, md_provider)
@@ -405,55 +1021,281 @@ def _auto_generate_md(
             MSG_MODEL_UNAVAILABLE.format(model=md_model, provider=md_provider, error=error_message),
         )
         return
-    bot.send_message(chat_id, MSG_GENERATE_MD)
-    bot.send_chat_action(chat_id, 'typing')
+    # Сообщение-заглушка обновляется текстом по мере генерации
+    status_msg = bot.send_message(chat_id, MSG_GENERATE_MD)
     logger.info(
         'Начинаю генерацию .md: idea_id=%d, model=%s, provider=%s, user_id=%s',
         idea_id, md_model, md_provider, user_id,
     )
+    parts: list[str] = []
+    last_edit = time.monotonic()
     try:
-        md_text = generate_idea_md(idea_name, idea_description, md_model, md_provider)
+        with typing_action(chat_id):
+            for piece in generate_idea_md_stream(idea_name, idea_description, md_model, md_provider):
+                parts.append(piece)
+                now = time.monotonic()
+                if now - last_edit >= MD_STREAM_EDIT_INTERVAL:
+                    last_edit = now
+                    _show_md_progress(chat_id, status_msg.message_id, ''.join(parts))
     except Exception as e:
         logger.error('Ошибка генерации .md для idea_id=%d: %s', idea_id, e)
         bot.send_message(chat_id, MSG_ERROR.format(error=str(e)))
         return
+    md_text = ''.join(parts)
     pending_md_generation[user_id] = {'idea_id': idea_id, 'draft_md': md_text}
-    send_long_message(chat_id, md_text)
-    keyboard = types.InlineKeyboardMarkup(row_width=2)
-    keyboard.row(
-        types.InlineKeyboardButton(
-            text="Утвердить", callback_data=f"approve_md:{idea_id}",
-        ),
-        types.InlineKeyboardButton(
-            text="Замечания", callback_data=f"revise_md:{idea_id}",
-        ),
-    )
+    # Готовый .md остаётся в сообщении-заглушке, если влезает; иначе заглушка заменяется частями
+    if not _show_md_progress(chat_id, status_msg.message_id, md_text):
+        call_in_background(bot.delete_message, chat_id=chat_id, message_id=status_msg.message_id)
+        send_long_message(chat_id, md_text)
+    _send_md_review_prompt(chat_id, idea_id)
+
+
+def _send_md_review_prompt(chat_id: int, idea_id: int) -> None:
+    """Отправляет кнопки «Утвердить» / «Замечания» под черновиком .md."""
+    keyboard = types.InlineKeyboardMarkup(keyboard=[[
+        types.InlineKeyboardButton(text="Утвердить", callback_data=f"approve_md:{idea_id}"),
+        types.InlineKeyboardButton(text="Замечания", callback_data=f"revise_md:{idea_id}"),
+    ]])
     bot.send_message(chat_id, MSG_MD_READY, reply_markup=keyboard)
 
 
+def _show_md_progress(chat_id: int, message_id: int, text: str) -> bool:
+    """
+    Показывает текущий текст .md в сообщении message_id.
+
+    Returns:
+        True, если сообщение содержит text; False, если текст не влезает в
+        одно сообщение или Telegram отклонил редактирование.
+    """
+    if not text or len(text) > TELEGRAM_MAX_MESSAGE_LENGTH:
+        return False
+    try:
+        bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+    except apihelper.ApiTelegramException as e:
+        if 'message is not modified' in e.description:
+            return True
+        logger.warning('Не удалось обновить .md в chat_id=%s: %s', chat_id, e)
+        return False
+    return True
+
+
+def bump_ideas_version(user_id: int) -> None:
+    """Отмечает, что список идей пользователя изменился (сбрасывает списки в сессиях multiselect)."""
+    _user_ideas_version[user_id] = _user_ideas_version.get(user_id, 0) + 1
+    _user_ideas_cache.pop(user_id)
+
+
+def get_user_ideas_cached(user_id: int) -> list[dict]:
+    """
+    Возвращает идеи пользователя из кеша или из БД (get_user_ideas()).
+
+    Запись живёт USER_IDEAS_CACHE_TTL секунд и отбрасывается, если версия списка
+    идей сменилась после её загрузки. Возвращаемый список не изменяется вызывающим кодом.
+    """
+    version = _user_ideas_version.get(user_id, 0)
+    cached = _user_ideas_cache.get(user_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    ideas = get_user_ideas(user_id)
+    _user_ideas_cache[user_id] = (version, ideas)
+    return ideas
+
+
+def _session_ideas(session: dict, user_id: int, exclude_idea_id: int | None = None) -> list[dict]:
+    """
+    Возвращает список идей, сохранённый в сессии multiselect.
+
+    Из БД список перечитывается, только если его ещё нет в сессии или идеи
+    пользователя изменились после его загрузки (см. bump_ideas_version()).
+
+    Args:
+        session: Сессия из pending_article_links / pending_reassign / pending_assign_list
+        user_id: ID пользователя
+        exclude_idea_id: ID идеи, которую не показываем (исходная идея при перепривязке)
+    """
+    version = _user_ideas_version.get(user_id, 0)
+    if 'ideas' not in session or session.get('ideas_version') != version:
+        ideas = get_user_ideas_cached(user_id)
+        if exclude_idea_id is not None:
+            ideas = [i for i in ideas if i['id'] != exclude_idea_id]
+        session['ideas'] = ideas
+        session['ideas_version'] = version
+    return session['ideas']
+
+
+def _ideas_for_rerender(session: dict, user_id: int, exclude_idea_id: int | None = None) -> list[dict] | None:
+    """
+    Возвращает список идей для новой клавиатуры multiselect или None, если она не изменилась.
+
+    Показанное состояние (версия списка идей, выбранные идеи) хранится в
+    session['rendered_selection']: двойное нажатие одной галочки возвращает
+    выбор к показанному, и edit_message_reply_markup не нужен.
+    """
+    shown = session.get('rendered_selection', (session.get('ideas_version'), frozenset()))
+    ideas = _session_ideas(session, user_id, exclude_idea_id)
+    current = (session['ideas_version'], frozenset(session['selected_ideas']))
+    if current == shown:
+        return None
+    session['rendered_selection'] = current
+    return ideas
+
+
+def _toggle_idea_selection(
+    call: types.CallbackQuery,
+    store: SessionStore,
+    create_keyboard: Callable[[list[dict], set[int]], types.InlineKeyboardMarkup],
+    expired_text: str = "Сессия истекла",
+) -> None:
+    """
+    Общая часть обработчиков галочек multiselect (toggle_link, toggle_reassign, toggle_assign_list).
+
+    Переключает выбор идеи из callback_data ('<префикс>:{idea_id}') в сессии
+    пользователя из store и планирует отложенное обновление клавиатуры
+    create_keyboard. Исходная идея перепривязки (session['source_idea_id'])
+    в список не попадает.
+    """
+    user_id = call.from_user.id
+    idea_id = int(call.data.partition(':')[2])
+    with user_session(user_id):
+        session = store.get(user_id)
+        if session:
+            selected = session['selected_ideas']
+            if idea_id in selected:
+                selected.discard(idea_id)
+            else:
+                selected.add(idea_id)
+    if not session:
+        bot.answer_callback_query(call.id, expired_text)
+        return
+    # Сразу отвечаем на callback, чтобы убрать "часики"
+    bot.answer_callback_query(call.id)
+
+    # Обновляем клавиатуру (отложенно: серия быстрых нажатий — одно обновление)
+    def build_keyboard() -> types.InlineKeyboardMarkup | None:
+        with user_session(user_id):
+            if store.get(user_id) is not session:
+                return None
+            ideas = _ideas_for_rerender(session, user_id, exclude_idea_id=session.get('source_idea_id'))
+            return None if ideas is None else create_keyboard(ideas, selected)
+
+    edit_reply_markup_debounced(call.message.chat.id, call.message.message_id, build_keyboard)
+
+
 def _offer_link_to_ideas(chat_id: int, user_id: int, article_id: int) -> None:
     """
     Предлагает пользователю привязать статью к идеям.
 
     Показывает multiselect клавиатуру если у пользователя есть идеи.
     """
-    ideas = get_user_ideas(user_id)
+    # Список идей сохраняется в сессии: переключение галочек не перечитывает его из БД
+    session = {'article_id': article_id, 'selected_ideas': set()}
+    ideas = _session_ideas(session, user_id)
 
     if not ideas:
         # У пользователя нет идей — не показываем выбор
         return
 
     # Инициализируем состояние multiselect
-    pending_article_links[user_id] = {
-        'article_id': article_id,
-        'selected_ideas': set(),
-    }
+    pending_article_links[user_id] = session
 
     keyboard = create_link_ideas_keyboard(ideas, set())
     bot.send_message(chat_id, MSG_LINK_SELECT_IDEAS, reply_markup=keyboard)
 
 
-def send_long_message(chat_id: int, text: str, chunk_size: int = MESSAGE_CHUNK_SIZE) -> None:
+PARAGRAPH_SEPARATOR = '\n\n'
+PARAGRAPH_SEPARATOR_LENGTH = len(PARAGRAPH_SEPARATOR)
+
+
+def _iter_paragraphs(text: str) -> Iterator[str]:
+    """Лениво отдаёт параграфы текста (разделитель — двойной перенос строки) без списка split()."""
+    start = 0
+    while True:
+        end = text.find(PARAGRAPH_SEPARATOR, start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + PARAGRAPH_SEPARATOR_LENGTH
+
+
+def _iter_pieces(text: str, chunk_size: int) -> Iterator[str]:
+    """Параграфы текста, где каждый слишком длинный параграф разрезан на куски не длиннее chunk_size."""
+    for paragraph in _iter_paragraphs(text):
+        if len(paragraph) > chunk_size:
+            yield from _split_oversize(paragraph, chunk_size)
+        else:
+            yield paragraph
+
+
+def _split_oversize(paragraph: str, chunk_size: int) -> Iterator[str]:
+    """
+    Режет параграф длиннее chunk_size на куски, которые Telegram примет.
+
+    Разрез ищется по последнему переносу строки, затем по пробелу в пределах
+    chunk_size; если их нет — режется ровно по chunk_size символов.
+    """
+    while len(paragraph) > chunk_size:
+        cut = paragraph.rfind('\n', 0, chunk_size + 1)
+        if cut <= 0:
+            cut = paragraph.rfind(' ', 0, chunk_size + 1)
+        if cut <= 0:
+            # Разделителя нет — жёсткий разрез
+            yield paragraph[:chunk_size]
+            paragraph = paragraph[chunk_size:]
+        else:
+            # Сам разделитель (перенос или пробел) не переносим в следующий кусок
+            yield paragraph[:cut]
+            paragraph = paragraph[cut + 1:]
+    yield paragraph
+
+
+def iter_message_chunks(text: str, chunk_size: int = MESSAGE_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Разбивает текст на части для отправки в Telegram.
+
+    Части собираются из целых параграфов и отдаются по мере готовности,
+    поэтому первая часть уходит в чат до разбора остального текста.
+    Параграф длиннее chunk_size режется по строкам/словам (_split_oversize),
+    иначе Telegram отклонил бы сообщение.
+
+    Args:
+        text: Текст сообщения
+        chunk_size: Максимальный размер одной части
+
+    Yields:
+        Части текста не длиннее chunk_size
+    """
+    # Простой случай - весь текст влезает в одно сообщение
+    if len(text) <= chunk_size:
+        yield text
+        return
+
+    # Параграфы текущей части копятся в списке и склеиваются один раз через join
+    parts: list[str] = []
+    size = 0
+    for paragraph in _iter_pieces(text, chunk_size):
+        # Проверяем, поместится ли параграф в текущую часть
+        added = len(paragraph) + (PARAGRAPH_SEPARATOR_LENGTH if parts else 0)
+        if parts and size + added > chunk_size:
+            # Текущая часть заполнена - отдаём и начинаем новую
+            yield PARAGRAPH_SEPARATOR.join(parts)
+            parts = []
+            added = len(paragraph)
+            size = 0
+        parts.append(paragraph)
+        size += added
+
+    # Последняя часть
+    if parts:
+        yield PARAGRAPH_SEPARATOR.join(parts)
+
+
+def send_long_message(
+    chat_id: int,
+    text: str,
+    chunk_size: int = MESSAGE_CHUNK_SIZE,
+    reply_markup: types.InlineKeyboardMarkup | None = None,
+) -> None:
     """
     Отправляет длинное сообщение частями.
 
@@ -464,37 +1306,37 @@ def send_long_message(chat_id: int, text: str, chunk_size: int = MESSAGE_CHUNK_S
         chat_id: ID чата для отправки
         text: Текст сообщения
         chunk_size: Максимальный размер одной части (по умолчанию 4000)
+        reply_markup: Клавиатура для последней части (без отдельного сообщения под неё)
     """
-    # Простой случай - весь текст влезает в одно сообщение
-    if len(text) <= chunk_size:
-        bot.send_message(chat_id, text)
-        return
+    chunks = iter_message_chunks(text, chunk_size)
+    chunk = next(chunks, None)
+    while chunk is not None:
+        next_chunk = next(chunks, None)
+        bot.send_message(chat_id, chunk, reply_markup=reply_markup if next_chunk is None else None)
+        chunk = next_chunk
 
-    # Разбиваем на параграфы
-    paragraphs = text.split('\n\n')
-    current_chunk = ''
-    PARAGRAPH_SEPARATOR = '\n\n'
 
-    for paragraph in paragraphs:
-        # Проверяем, поместится ли параграф в текущую часть
-        separator_length = len(PARAGRAPH_SEPARATOR) if current_chunk else 0
-        would_fit = len(current_chunk) + separator_length + len(paragraph) <= chunk_size
+def send_with_header(chat_id: int, header: str, text: str) -> None:
+    """
+    Отправляет заголовок вместе с текстом без отдельного сообщения под заголовок.
 
-        if would_fit:
-            # Добавляем параграф к текущей части
-            if current_chunk:
-                current_chunk += PARAGRAPH_SEPARATOR + paragraph
-            else:
-                current_chunk = paragraph
-        else:
-            # Текущая часть заполнена - отправляем и начинаем новую
-            if current_chunk:
-                bot.send_message(chat_id, current_chunk)
-            current_chunk = paragraph
+    Если всё влезает в лимит Telegram — одно сообщение. Текст длиннее
+    SUMMARY_DOCUMENT_THRESHOLD уходит одним файлом .md с заголовком в подписи.
+    Иначе заголовок (оканчивается на двойной перенос строки, то есть является
+    параграфом) попадает в первую часть send_long_message() вместе с началом текста.
 
-    # Отправляем последнюю часть
-    if current_chunk:
-        bot.send_message(chat_id, current_chunk)
+    Args:
+        chat_id: ID чата для отправки
+        header: Заголовок, оканчивающийся на PARAGRAPH_SEPARATOR
+        text: Основной текст (конспект)
+    """
+    if len(header) + len(text) <= TELEGRAM_MAX_MESSAGE_LENGTH:
+        bot.send_message(chat_id, header + text)
+    elif len(text) > SUMMARY_DOCUMENT_THRESHOLD:
+        document = types.InputFile(io.BytesIO(text.encode('utf-8')), file_name='summary.md')
+        bot.send_document(chat_id, document, caption=header.strip()[:TELEGRAM_MAX_CAPTION_LENGTH])
+    else:
+        send_long_message(chat_id, header + text)
 
 
 def create_main_keyboard() -> types.ReplyKeyboardMarkup:
@@ -510,12 +1352,62 @@ def create_main_keyboard() -> types.ReplyKeyboardMarkup:
     return keyboard
 
 
+def create_model_menu_keyboard() -> types.InlineKeyboardMarkup:
+    """
+    Создаёт inline-клавиатуру меню /model: что менять — модель конспектов или .md.
+
+    Returns:
+        InlineKeyboardMarkup с двумя кнопками выбора назначения
+    """
+    return types.InlineKeyboardMarkup(keyboard=[
+        [types.InlineKeyboardButton(text='Сменить модель конспектов', callback_data='choose_provider:summary')],
+        [types.InlineKeyboardButton(text='Сменить модель .md описаний', callback_data='choose_provider:md')],
+    ])
+
+
+# Статические клавиатуры не зависят от пользователя — собираем один раз и переиспользуем
+MAIN_KEYBOARD: types.ReplyKeyboardMarkup = create_main_keyboard()
+MODEL_MENU_KEYBOARD: types.InlineKeyboardMarkup = create_model_menu_keyboard()
+# Клавиатуры выбора провайдера для обоих назначений модели
+PROVIDER_KEYBOARDS: dict[str, types.InlineKeyboardMarkup] = {
+    purpose: create_provider_keyboard(purpose) for purpose in ('summary', 'md')
+}
+
+
+# Маршруты callback-кнопок: ключ — часть callback_data до ':' включительно ('toggle_link:')
+# или вся строка для кнопок без параметров ('link_done')
+CallbackHandler = Callable[[types.CallbackQuery], None]
+_callback_routes: dict[str, CallbackHandler] = {}
+
+
+def callback_route(key: str) -> Callable[[CallbackHandler], CallbackHandler]:
+    """Регистрирует обработчик callback-кнопок с ключом key (см. dispatch_callback())."""
+    def register(handler: CallbackHandler) -> CallbackHandler:
+        _callback_routes[key] = handler
+        return handler
+    return register
+
+
+@bot.callback_query_handler(func=lambda call: True)
+def dispatch_callback(call: telebot.types.CallbackQuery) -> None:
+    """
+    Единственный обработчик callback_query в telebot: выбирает обработчик по словарю.
+
+    Вместо перебора фильтров всех обработчиков — один partition и поиск в словаре.
+    """
+    prefix, sep, _ = (call.data or '').partition(':')
+    handler = _callback_routes.get(prefix + sep)
+    if handler is None:
+        logger.warning('Неизвестный callback: user_id=%s, data=%r', call.from_user.id, call.data)
+        return
+    handler(call)
+
+
 # Обработчики команд и сообщений
 @bot.message_handler(commands=['start'])
 def handle_start(message: telebot.types.Message) -> None:
     """Обрабатывает команду /start - приветствие и инструкции."""
-    keyboard = create_main_keyboard()
-    bot.send_message(message.chat.id, MSG_START, reply_markup=keyboard)
+    bot.send_message(message.chat.id, MSG_START, reply_markup=MAIN_KEYBOARD)
 
 
 @bot.message_handler(commands=['help'])
@@ -528,8 +1420,7 @@ def handle_help(message: telebot.types.Message) -> None:
 def handle_model(message: telebot.types.Message) -> None:
     """Обрабатывает команду /model — показывает текущие настройки и меню выбора."""
     user_id = message.from_user.id
-    summary_model, summary_provider = get_user_model(user_id)
-    md_model, md_provider = get_user_md_model(user_id)
+    (summary_model, summary_provider), (md_model, md_provider) = get_user_models(user_id)
 
     text = MSG_CURRENT_MODELS.format(
         summary_model=summary_model,
@@ -538,26 +1429,15 @@ def handle_model(message: telebot.types.Message) -> None:
         md_provider=md_provider,
     )
 
-    keyboard = types.InlineKeyboardMarkup(row_width=1)
-    keyboard.add(
-        types.InlineKeyboardButton(
-            text='Сменить модель конспектов',
-            callback_data='choose_provider:summary',
-        ),
-        types.InlineKeyboardButton(
-            text='Сменить модель .md описаний',
-            callback_data='choose_provider:md',
-        ),
-    )
-    bot.send_message(message.chat.id, text, reply_markup=keyboard)
+    bot.send_message(message.chat.id, text, reply_markup=MODEL_MENU_KEYBOARD)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('choose_provider:'))
+@callback_route('choose_provider:')
 def handle_choose_provider(call: telebot.types.CallbackQuery) -> None:
     """Показывает кнопки выбора провайдера."""
-    purpose = call.data.split(':')[1]  # 'summary' или 'md'
+    _, _, purpose = call.data.partition(':')  # 'summary' или 'md'
     purpose_label = 'конспектов' if purpose == 'summary' else '.md описаний'
-    keyboard = create_provider_keyboard(purpose)
+    keyboard = PROVIDER_KEYBOARDS.get(purpose) or create_provider_keyboard(purpose)
     bot.edit_message_text(
         MSG_PROVIDER_SELECT.format(purpose=purpose_label),
         chat_id=call.message.chat.id,
@@ -567,13 +1447,13 @@ def handle_choose_provider(call: telebot.types.CallbackQuery) -> None:
     bot.answer_callback_query(call.id)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('provider:'))
+@callback_route('provider:')
 def handle_provider_callback(call: telebot.types.CallbackQuery) -> None:
     """Обрабатывает выбор провайдера, запрашивает ввод названия модели."""
     user_id = call.from_user.id
-    parts = call.data.split(':')
-    purpose = parts[1]   # 'summary' или 'md'
-    provider = parts[2]  # 'ollama', 'openai', 'openrouter'
+    # provider:{purpose}:{provider_id} — разбираем без промежуточного списка
+    _, _, rest = call.data.partition(':')
+    purpose, _, provider = rest.partition(':')  # 'summary'|'md', 'ollama'|'openai'|'openrouter'
 
     pending_model_selection[user_id] = {
         'purpose': purpose,
@@ -611,9 +1491,10 @@ def process_model_name_input(message: telebot.types.Message, user_id: int) -> No
         message.chat.id,
         MSG_MODEL_CHECKING.format(model=model_name, provider=provider_label),
     )
-    bot.send_chat_action(message.chat.id, 'typing')
 
-    is_available, error_message = check_model_availability(model_name, provider)
+    # Пользователь явно выбирает модель — проверяем по-настоящему, минуя кеш
+    with typing_action(message.chat.id):
+        is_available, error_message = check_model_availability(model_name, provider, force=True)
 
     if not is_available:
         bot.edit_message_text(
@@ -624,11 +1505,7 @@ def process_model_name_input(message: telebot.types.Message, user_id: int) -> No
         pending_model_selection.pop(user_id, None)
         return
 
-    model_config = {'provider': provider, 'model': model_name}
-    if purpose == 'summary':
-        user_models[user_id] = model_config
-    else:
-        user_md_models[user_id] = model_config
+    set_user_model(purpose, user_id, model_name, provider)
 
     bot.edit_message_text(
         MSG_MODEL_SET.format(model=model_name, provider=provider_label),
@@ -638,7 +1515,7 @@ def process_model_name_input(message: telebot.types.Message, user_id: int) -> No
     pending_model_selection.pop(user_id, None)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('cache:'))
+@callback_route('cache:')
 def handle_cache_callback(call: telebot.types.CallbackQuery) -> None:
     """
     Обрабатывает выбор действия при дубликате.
@@ -646,9 +1523,10 @@ def handle_cache_callback(call: telebot.types.CallbackQuery) -> None:
     Callback data имеет формат: "cache:show:url_hash" или "cache:regen:url_hash"
     """
     user_id = call.from_user.id
-    parts = call.data.split(':')
-    action = parts[1]
-    url_hash = parts[2]
+    chat_id = call.message.chat.id
+    message_id = call.message.message_id
+    _, _, rest = call.data.partition(':')
+    action, _, url_hash = rest.partition(':')
 
     # Получаем URL из временного хранилища
     url = pending_cache_urls.get(url_hash)
@@ -664,10 +1542,10 @@ def handle_cache_callback(call: telebot.types.CallbackQuery) -> None:
         if summary:
             bot.edit_message_text(
                 '📦 Сохранённый конспект:',
-                chat_id=call.message.chat.id,
-                message_id=call.message.message_id,
+                chat_id=chat_id,
+                message_id=message_id,
             )
-            send_long_message(call.message.chat.id, summary)
+            send_long_message(chat_id, summary)
             bot.answer_callback_query(call.id, 'Показан сохранённый конспект')
         else:
             bot.answer_callback_query(call.id, 'Конспект не найден')
@@ -678,54 +1556,62 @@ def handle_cache_callback(call: telebot.types.CallbackQuery) -> None:
         # Сгенерировать заново
         bot.edit_message_text(
             '🔄 Генерирую заново...',
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
+            chat_id=chat_id,
+            message_id=message_id,
         )
         bot.answer_callback_query(call.id, 'Начинаю генерацию')
 
-        # Проверяем доступность модели
-        is_available, error_message = check_model_availability(model, provider)
-        if not is_available:
-            error_text = MSG_MODEL_UNAVAILABLE.format(model=model, provider=provider, error=error_message)
-            bot.send_message(call.message.chat.id, error_text)
-            logger.warning('Модель %s (%s) недоступна для %s: %s', model, provider, user_id, error_message)
-            return
+        # Проверка модели и LLM — в пуле pipeline_executor, поток telebot сразу освобождается
+        pipeline_executor.submit(_run_regen, chat_id, url, url_hash, model, provider, user_id)
 
-        logger.info('Начинаю регенерацию: url=%s, model=%s, provider=%s, user_id=%s',
-                    url, model, provider, user_id)
-        try:
-            # skip_cache=True для принудительной перегенерации
-            result = process_article(
-                url,
-                model=model,
-                provider=provider,
-                user_id=user_id,
-                skip_cache=True,
-            )
 
-            if result is None:
-                bot.send_message(
-                    call.message.chat.id,
-                    MSG_ERROR.format(error='Не удалось обработать статью'),
-                )
-                return
+def _run_regen(chat_id: int, url: str, url_hash: str, model: str, provider: str, user_id: int) -> None:
+    """
+    Перегенерирует конспект статьи в пуле pipeline_executor и отправляет его.
 
-            summary, article_data = result
-            save_article_to_db(article_data, summary, model, user_id, url)
+    Args:
+        chat_id: ID чата для ответа
+        url: URL статьи
+        url_hash: ключ URL в pending_cache_urls (очищается после обработки)
+        model: модель для генерации
+        provider: провайдер модели
+        user_id: ID пользователя
+    """
+    # Проверяем доступность модели
+    is_available, error_message = check_model_availability(model, provider)
+    if not is_available:
+        error_text = MSG_MODEL_UNAVAILABLE.format(model=model, provider=provider, error=error_message)
+        bot.send_message(chat_id, error_text)
+        logger.warning('Модель %s (%s) недоступна для %s: %s', model, provider, user_id, error_message)
+        return
 
-            header = f'🔄 Перегенерировано!\nМодель: {model} ({provider})\n\n'
-            if len(header) + len(summary) <= TELEGRAM_MAX_MESSAGE_LENGTH:
-                bot.send_message(call.message.chat.id, header + summary)
-            else:
-                bot.send_message(call.message.chat.id, f'🔄 Перегенерировано! Модель: {model} ({provider})')
-                send_long_message(call.message.chat.id, summary)
+    logger.info('Начинаю регенерацию: url=%s, model=%s, provider=%s, user_id=%s',
+                url, model, provider, user_id)
+    try:
+        # skip_cache=True для принудительной перегенерации
+        with typing_action(chat_id):
+            result = process_article_cached(url, model, provider, user_id, skip_cache=True)
 
-        except Exception as e:
-            bot.send_message(call.message.chat.id, MSG_ERROR.format(error=str(e)))
-            logger.error('Ошибка перегенерации для %s: %s', user_id, e)
+        if result is None:
+            bot.send_message(
+                chat_id,
+                MSG_ERROR.format(error='Не удалось обработать статью'),
+            )
+            return
 
-        # Очищаем временное хранилище
-        pending_cache_urls.pop(url_hash, None)
+        summary, article_data = result
+        header = f'🔄 Перегенерировано!\nМодель: {model} ({provider})\n\n'
+        send_with_header(chat_id, header, summary)
+
+        # ID статьи здесь не нужен — сохраняем после отправки, в фоне
+        write_in_background(save_article_to_db, article_data, summary, model, user_id, url)
+
+    except Exception as e:
+        bot.send_message(chat_id, MSG_ERROR.format(error=str(e)))
+        logger.error('Ошибка перегенерации для %s: %s', user_id, e)
+
+    # Очищаем временное хранилище
+    pending_cache_urls.pop(url_hash, None)
 
 
 # ========================
@@ -733,64 +1619,39 @@ def handle_cache_callback(call: telebot.types.CallbackQuery) -> None:
 # ========================
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('toggle_link:'))
+@callback_route('toggle_link:')
 def handle_toggle_link(call: telebot.types.CallbackQuery) -> None:
     """
     Обрабатывает toggle выбора идеи в multiselect.
 
     Callback data формат: toggle_link:{idea_id}
     """
-    user_id = call.from_user.id
-    idea_id = int(call.data.split(':')[1])
-
-    # Проверяем наличие активной сессии
-    if user_id not in pending_article_links:
-        bot.answer_callback_query(call.id, "Сессия истекла, отправь статью заново")
-        return
-
-    # Сразу отвечаем на callback, чтобы убрать "часики"
-    bot.answer_callback_query(call.id)
-
-    session = pending_article_links[user_id]
-    selected = session['selected_ideas']
-
-    # Toggle состояния
-    if idea_id in selected:
-        selected.discard(idea_id)
-    else:
-        selected.add(idea_id)
-
-    # Обновляем клавиатуру
-    try:
-        ideas = get_user_ideas(user_id)
-        keyboard = create_link_ideas_keyboard(ideas, selected)
-
-        bot.edit_message_reply_markup(
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
-            reply_markup=keyboard,
-        )
-    except Exception as e:
-        logger.error('Ошибка toggle_link для %s: %s', user_id, e)
+    _toggle_idea_selection(
+        call, pending_article_links, create_link_ideas_keyboard, "Сессия истекла, отправь статью заново",
+    )
 
 
-@bot.callback_query_handler(func=lambda call: call.data == 'link_done')
+@callback_route('link_done')
 def handle_link_done(call: telebot.types.CallbackQuery) -> None:
     """
     Обрабатывает завершение выбора идей — сохраняет привязки.
     """
     user_id = call.from_user.id
-
-    if user_id not in pending_article_links:
+    # Отложенное обновление галочек не должно вернуть клавиатуру в закрытое сообщение
+    cancel_markup_edit(call.message.chat.id, call.message.message_id)
+
+    # Сессия снимается сразу: повторное нажатие «Готово» не сохранит привязки второй раз
+    with user_session(user_id):
+        session = pending_article_links.pop(user_id)
+        selected_ideas = list(session['selected_ideas']) if session else []
+    if session is None:
         bot.answer_callback_query(call.id, "Сессия истекла")
         return
 
     # Сразу отвечаем на callback, чтобы убрать "часики" в Telegram
     bot.answer_callback_query(call.id)
 
-    session = pending_article_links[user_id]
     article_id = session['article_id']
-    selected_ideas = session['selected_ideas']
 
     try:
         if not selected_ideas:
@@ -801,14 +1662,9 @@ def handle_link_done(call: telebot.types.CallbackQuery) -> None:
                 message_id=call.message.message_id,
             )
         else:
-            # Сохраняем привязки
-            linked_names = []
-            for idea_id in selected_ideas:
-                success = link_article_to_idea(article_id, idea_id, user_id)
-                if success:
-                    idea = get_idea_by_id(idea_id, user_id)
-                    if idea:
-                        linked_names.append(idea['name'])
+            # Сохраняем привязки одной транзакцией; функция возвращает привязанные идеи с названиями
+            linked = link_article_to_ideas(article_id, selected_ideas, user_id)
+            linked_names = [idea['name'] for idea in linked]
 
             if linked_names:
                 bot.edit_message_text(
@@ -825,28 +1681,28 @@ def handle_link_done(call: telebot.types.CallbackQuery) -> None:
     except Exception as e:
         logger.error('Ошибка привязки статьи к идеям для %s: %s', user_id, e)
         bot.send_message(call.message.chat.id, MSG_ERROR.format(error=str(e)))
-    finally:
-        # Очищаем сессию в любом случае
-        pending_article_links.pop(user_id, None)
 
 
-@bot.callback_query_handler(func=lambda call: call.data == 'link_skip')
+@callback_route('link_skip')
 def handle_link_skip(call: telebot.types.CallbackQuery) -> None:
     """
     Обрабатывает отказ от привязки статьи к идеям.
     При отказе статья удаляется из базы данных.
     """
     user_id = call.from_user.id
+    cancel_markup_edit(call.message.chat.id, call.message.message_id)
 
     # Сразу отвечаем на callback, чтобы убрать "часики"
     bot.answer_callback_query(call.id)
 
-    # Проверяем наличие активной сессии для пользователя
-    if user_id not in pending_article_links:
+    # Проверяем наличие активной сессии для пользователя и сразу снимаем её
+    with user_session(user_id):
+        session = pending_article_links.pop(user_id)
+    if session is None:
         logger.warning('Сессия не найдена для user_id %s при link_skip', user_id)
     else:
         # Извлекаем article_id из сессии
-        article_id = pending_article_links[user_id].get('article_id')
+        article_id = session.get('article_id')
 
         # Проверяем, что article_id существует (не None и не 0)
         if article_id is None or article_id == 0:
@@ -854,8 +1710,8 @@ def handle_link_skip(call: telebot.types.CallbackQuery) -> None:
         else:
             # Удаляем статью из БД
             try:
-                delete_article(article_id)
-                logger.info('Статья ID %s удалена из БД по запросу user_id %s', article_id, user_id)
+                if delete_article(article_id, user_id):
+                    logger.info('Статья ID %s удалена из БД по запросу user_id %s', article_id, user_id)
             except Exception as exc:
                 logger.error('Ошибка при удалении статьи ID %s для user_id %s: %s', article_id, user_id, exc)
 
@@ -867,12 +1723,9 @@ def handle_link_skip(call: telebot.types.CallbackQuery) -> None:
         )
     except Exception as e:
         logger.error('Ошибка link_skip для %s: %s', user_id, e)
-    finally:
-        # Очищаем сессию в любом случае
-        pending_article_links.pop(user_id, None)
 
 
-@bot.message_handler(func=lambda message: extract_url(message.text) is not None)
+@bot.message_handler(extracted_url=True)
 def handle_url(message: telebot.types.Message) -> None:
     """
     Обрабатывает сообщения с URL - создает конспект статьи.
@@ -881,26 +1734,25 @@ def handle_url(message: telebot.types.Message) -> None:
     проверяет наличие в кеше, обрабатывает статью с помощью
     выбранной модели и отправляет конспект.
     """
-    url = extract_url(message.text)
-    if not url:
-        bot.reply_to(message, MSG_UNKNOWN)
-        return
+    # URL и источник уже определены фильтром UrlFilter
+    url = message.extracted_url
+    source = message.article_source
 
+    chat_id = message.chat.id
     user_id = message.from_user.id
     model, provider = get_user_model(user_id)
 
-    if not is_supported_url(url):
+    if source == 'unknown':
         bot.reply_to(message, MSG_UNSUPPORTED)
         return
 
     # Проверяем наличие в кеше
     if article_exists(url):
         logger.info('Дубликат статьи обнаружен: url=%s, user_id=%s', url, user_id)
-        url_hash = str(hash(url))[-10:]
-        pending_cache_urls[url_hash] = url
+        pending_cache_urls[url_cache_key(url)] = url
         keyboard = create_cache_keyboard(url)
         bot.send_message(
-            message.chat.id,
+            chat_id,
             MSG_DUPLICATE_FOUND,
             reply_markup=keyboard,
         )
@@ -914,57 +1766,102 @@ def handle_url(message: telebot.types.Message) -> None:
         logger.warning('Модель %s (%s) недоступна для %s: %s', model, provider, user_id, error_message)
         return
 
-    bot.send_chat_action(message.chat.id, 'typing')
     status_msg = bot.reply_to(message, MSG_PROCESSING)
 
     logger.info('Начинаю обработку статьи: url=%s, model=%s, provider=%s, user_id=%s',
                 url, model, provider, user_id)
+    # Долгий парсинг + LLM — в отдельном пуле, чтобы не занимать потоки обработки обновлений
+    pipeline_executor.submit(
+        _run_pipeline, chat_id, status_msg.message_id, url, source, model, provider, user_id,
+    )
+
+
+def _run_pipeline(
+    chat_id: int,
+    status_message_id: int,
+    url: str,
+    source: str,
+    model: str,
+    provider: str,
+    user_id: int,
+) -> None:
+    """
+    Обрабатывает статью в пуле pipeline_executor и отправляет конспект.
+
+    Args:
+        chat_id: ID чата для ответа
+        status_message_id: ID сообщения «Обрабатываю...» (удаляется или заменяется ошибкой)
+        url: URL статьи
+        source: источник, определённый в handle_url()
+        model: модель для генерации
+        provider: провайдер модели
+        user_id: ID пользователя
+    """
     try:
-        result = process_article(url, model=model, provider=provider, user_id=user_id)
+        # Индикатор «печатает» держится, пока идут парсинг и генерация
+        with typing_action(chat_id):
+            result = process_article_cached(url, model, provider, user_id, source=source)
 
         if result is None:
             bot.edit_message_text(
                 MSG_ERROR.format(error='Не удалось обработать статью'),
-                chat_id=message.chat.id,
-                message_id=status_msg.message_id,
+                chat_id=chat_id,
+                message_id=status_message_id,
             )
             return
 
         summary, article_data = result
-        # Сохраняем статью в БД и получаем ID
-        article_id = save_article_to_db(article_data, summary, model, user_id, url)
-
         # Удаляем статусное сообщение
-        try:
-            bot.delete_message(chat_id=message.chat.id, message_id=status_msg.message_id)
-        except Exception:
-            pass
-
-        # Отправляем конспект
-        header = f'Готово!\nМодель: {model} ({provider})\nИсточник: {url}\n\n'
-        if len(header) + len(summary) <= TELEGRAM_MAX_MESSAGE_LENGTH:
-            bot.send_message(message.chat.id, header + summary)
-        else:
-            bot.send_message(message.chat.id, f'Готово! Модель: {model} ({provider})')
-            send_long_message(message.chat.id, summary)
-
-        # Предлагаем привязать статью к идеям
-        if article_id:
-            _offer_link_to_ideas(message.chat.id, user_id, article_id)
+        call_in_background(bot.delete_message, chat_id=chat_id, message_id=status_message_id)
+        _deliver_summary(chat_id, url, model, provider, user_id, summary, article_data)
 
     except Exception as e:
         error_text = MSG_ERROR.format(error=str(e))
         try:
             bot.edit_message_text(
                 error_text,
-                chat_id=message.chat.id,
-                message_id=status_msg.message_id,
+                chat_id=chat_id,
+                message_id=status_message_id,
             )
         except Exception:
-            bot.send_message(message.chat.id, error_text)
+            bot.send_message(chat_id, error_text)
         logger.error('Ошибка обработки URL для %s: %s', user_id, e)
 
 
+def _deliver_summary(
+    chat_id: int,
+    url: str,
+    model: str,
+    provider: str,
+    user_id: int,
+    summary: str,
+    article_data: dict,
+) -> None:
+    """
+    Сохраняет статью в БД, отправляет конспект и предлагает привязать статью к идеям.
+
+    Args:
+        chat_id: ID чата для ответа
+        url: URL статьи
+        model: модель, которой сгенерирован конспект
+        provider: провайдер модели
+        user_id: ID пользователя
+        summary: готовый конспект
+        article_data: данные статьи из scraper
+    """
+    # Сохраняем статью в БД и получаем ID
+    article_id = save_article_to_db(article_data, summary, model, user_id, url)
+
+    # Отправляем конспект
+    header = f'Готово!\nМодель: {model} ({provider})\nИсточник: {url}\n\n'
+    send_with_header(chat_id, header, summary)
+
+    # Предлагаем привязать статью к идеям. Если ту же ссылку одновременно прислал другой пользователь,
+    # запись по URL уже принадлежит ему: привязка и удаление по «Пропустить» относятся только к своим статьям
+    if article_id and get_article_owner(article_id) == user_id:
+        _offer_link_to_ideas(chat_id, user_id, article_id)
+
+
 @bot.message_handler(commands=['new_idea'])
 def handle_new_idea(message: telebot.types.Message) -> None:
     """
@@ -1011,6 +1908,7 @@ def process_idea_description(message: telebot.types.Message, user_id: int, idea_
 
     try:
         idea_id = create_idea(idea_name, idea_description if idea_description else None, user_id)
+        bump_ideas_version(user_id)
         bot.send_message(message.chat.id, MSG_IDEA_CREATED.format(name=idea_name))
         # Автоматическая генерация .md по описанию
         _auto_generate_md(
@@ -1029,21 +1927,20 @@ def handle_ideas(message: telebot.types.Message) -> None:
     Получает все идеи пользователя и отображает их в виде inline-клавиатуры.
     """
     user_id = message.from_user.id
-    ideas = get_user_ideas(user_id)
+    ideas = get_user_ideas_cached(user_id)
 
     if not ideas:
         bot.send_message(message.chat.id, MSG_IDEAS_EMPTY)
         return
 
-    # Создаём inline-клавиатуру со списком идей
-    keyboard = types.InlineKeyboardMarkup(row_width=1)
-
-    for idx, idea in enumerate(ideas, 1):
-        button = types.InlineKeyboardButton(
+    # Создаём inline-клавиатуру со списком идей: одна кнопка в строке
+    keyboard = types.InlineKeyboardMarkup(keyboard=[
+        [types.InlineKeyboardButton(
             text=f"{idx}. {idea['name'][:50]}",  # Ограничиваем длину названия
             callback_data=f"view_idea:{idea['id']}",
-        )
-        keyboard.add(button)
+        )]
+        for idx, idea in enumerate(ideas, 1)
+    ])
 
     bot.send_message(message.chat.id, MSG_IDEAS_TITLE, reply_markup=keyboard)
     
@@ -1056,46 +1953,46 @@ def handle_articles(message: telebot.types.Message) -> None:
     if not articles:
         bot.send_message(message.chat.id, MSG_ARTICLES_EMPTY)
         return
+    # Привязки всех статей — одним запросом, а не запросом на каждую статью
+    ideas_map = get_article_ideas_map(user_id)
     # Формируем текст и inline-кнопки привязки
     lines: list[str] = []
-    keyboard = types.InlineKeyboardMarkup(row_width=2)
+    rows: list[list[types.InlineKeyboardButton]] = []
     for idx, art in enumerate(articles, 1):
-        ideas = get_ideas_by_article(art['id'], user_id)
+        ideas = ideas_map.get(art['id'])
         idea_names = ", ".join(i['name'] for i in ideas) if ideas else "(без идеи)"
         lines.append(f"{idx}. [{art['source']}] {art['title'][:50]}\n   Идеи: {idea_names}")
-        assign_btn = types.InlineKeyboardButton(
+        rows.append([types.InlineKeyboardButton(
             text=f"-> {idx}. {art['title'][:20]}",
             callback_data=f"assign_list:{art['id']}",
-        )
-        keyboard.add(assign_btn)
+        )])
+    keyboard = types.InlineKeyboardMarkup(keyboard=rows)
     text = MSG_ARTICLES_TITLE.format(count=len(articles)) + "\n\n" + "\n".join(lines)
     # Разбиваем длинный текст, клавиатуру добавляем к последнему сообщению
-    if len(text) <= MESSAGE_CHUNK_SIZE:
-        bot.send_message(message.chat.id, text, reply_markup=keyboard)
-    else:
-        send_long_message(message.chat.id, text)
-        bot.send_message(message.chat.id, "Привязка статей к идеям:", reply_markup=keyboard)
+    send_long_message(message.chat.id, text, reply_markup=keyboard)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('reassign:'))
+@callback_route('reassign:')
 def handle_reassign_start(call: telebot.types.CallbackQuery) -> None:
     """Начало перепривязки. Callback: reassign:{article_id}:{source_idea_id}"""
     user_id = call.from_user.id
-    parts = call.data.split(':')
-    article_id, source_idea_id = int(parts[1]), int(parts[2])
+    _, _, rest = call.data.partition(':')
+    article_id, _, source_idea_id = rest.partition(':')
+    article_id, source_idea_id = int(article_id), int(source_idea_id)
     logger.info(
         'Перепривязка: user_id=%s, article_id=%d, source_idea_id=%d',
         user_id, article_id, source_idea_id,
     )
-    ideas = [i for i in get_user_ideas(user_id) if i['id'] != source_idea_id]
-    if not ideas:
-        bot.answer_callback_query(call.id, MSG_REASSIGN_NO_IDEAS)
-        return
-    pending_reassign[user_id] = {
+    session = {
         'article_id': article_id,
         'source_idea_id': source_idea_id,
         'selected_ideas': set(),
     }
+    ideas = _session_ideas(session, user_id, exclude_idea_id=source_idea_id)
+    if not ideas:
+        bot.answer_callback_query(call.id, MSG_REASSIGN_NO_IDEAS)
+        return
+    pending_reassign[user_id] = session
     bot.send_message(
         call.message.chat.id,
         MSG_REASSIGN_SELECT,
@@ -1104,72 +2001,54 @@ def handle_reassign_start(call: telebot.types.CallbackQuery) -> None:
     bot.answer_callback_query(call.id)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('toggle_reassign:'))
+@callback_route('toggle_reassign:')
 def handle_toggle_reassign(call: telebot.types.CallbackQuery) -> None:
     """Toggle выбора идеи при перепривязке."""
-    user_id = call.from_user.id
-    session = pending_reassign.get(user_id)
-    if not session:
-        bot.answer_callback_query(call.id, "Сессия истекла")
-        return
-    idea_id = int(call.data.split(':')[1])
-    selected = session['selected_ideas']
-    if idea_id in selected:
-        selected.discard(idea_id)
-    else:
-        selected.add(idea_id)
-    ideas = [i for i in get_user_ideas(user_id) if i['id'] != session['source_idea_id']]
-    bot.edit_message_reply_markup(
-        call.message.chat.id,
-        call.message.message_id,
-        reply_markup=create_reassign_keyboard(ideas, selected),
-    )
-    bot.answer_callback_query(call.id)
+    _toggle_idea_selection(call, pending_reassign, create_reassign_keyboard)
 
 
-@bot.callback_query_handler(func=lambda call: call.data == 'reassign_done')
+@callback_route('reassign_done')
 def handle_reassign_done(call: telebot.types.CallbackQuery) -> None:
     """Завершение перепривязки: link к новым идеям, unlink из старой."""
     user_id = call.from_user.id
-    session = pending_reassign.pop(user_id, None)
-    if not session or not session['selected_ideas']:
+    cancel_markup_edit(call.message.chat.id, call.message.message_id)
+    with user_session(user_id):
+        session = pending_reassign.pop(user_id)
+        selected_ideas = list(session['selected_ideas']) if session else []
+    if not selected_ideas:
         bot.answer_callback_query(call.id, MSG_REASSIGN_CANCELLED)
         return
-    for idea_id in session['selected_ideas']:
-        link_article_to_idea(session['article_id'], idea_id, user_id)
-    unlink_article_from_idea(session['article_id'], session['source_idea_id'], user_id)
+    reassign_article(session['article_id'], session['source_idea_id'], selected_ideas, user_id)
     logger.info(
         'Перепривязка завершена: user_id=%s, article_id=%d, из idea_id=%d в ideas=%s',
-        user_id, session['article_id'], session['source_idea_id'],
-        list(session['selected_ideas']),
+        user_id, session['article_id'], session['source_idea_id'], selected_ideas,
     )
     bot.edit_message_text(MSG_REASSIGN_DONE, call.message.chat.id, call.message.message_id)
     bot.answer_callback_query(call.id)
 
 
-@bot.callback_query_handler(func=lambda call: call.data == 'reassign_cancel')
+@callback_route('reassign_cancel')
 def handle_reassign_cancel(call: telebot.types.CallbackQuery) -> None:
     """Отмена перепривязки."""
     user_id = call.from_user.id
+    cancel_markup_edit(call.message.chat.id, call.message.message_id)
     pending_reassign.pop(user_id, None)
     bot.edit_message_text(MSG_REASSIGN_CANCELLED, call.message.chat.id, call.message.message_id)
     bot.answer_callback_query(call.id)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('assign_list:'))
+@callback_route('assign_list:')
 def handle_assign_list_start(call: telebot.types.CallbackQuery) -> None:
     """Начало привязки статьи к идеям из общего списка /articles."""
     user_id = call.from_user.id
-    article_id = int(call.data.split(':')[1])
+    article_id = int(call.data.partition(':')[2])
     logger.info('Привязка из /articles: user_id=%s, article_id=%d', user_id, article_id)
-    ideas = get_user_ideas(user_id)
+    session = {'article_id': article_id, 'selected_ideas': set()}
+    ideas = _session_ideas(session, user_id)
     if not ideas:
         bot.answer_callback_query(call.id, MSG_ASSIGN_NO_IDEAS)
         return
-    pending_assign_list[user_id] = {
-        'article_id': article_id,
-        'selected_ideas': set(),
-    }
+    pending_assign_list[user_id] = session
     bot.send_message(
         call.message.chat.id,
         MSG_ASSIGN_SELECT,
@@ -1178,61 +2057,47 @@ def handle_assign_list_start(call: telebot.types.CallbackQuery) -> None:
     bot.answer_callback_query(call.id)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('toggle_assign_list:'))
+@callback_route('toggle_assign_list:')
 def handle_toggle_assign_list(call: telebot.types.CallbackQuery) -> None:
     """Toggle выбора идеи при привязке из общего списка."""
-    user_id = call.from_user.id
-    session = pending_assign_list.get(user_id)
-    if not session:
-        bot.answer_callback_query(call.id, "Сессия истекла")
-        return
-    idea_id = int(call.data.split(':')[1])
-    selected = session['selected_ideas']
-    if idea_id in selected:
-        selected.discard(idea_id)
-    else:
-        selected.add(idea_id)
-    ideas = get_user_ideas(user_id)
-    bot.edit_message_reply_markup(
-        call.message.chat.id,
-        call.message.message_id,
-        reply_markup=create_assign_list_keyboard(ideas, selected),
-    )
-    bot.answer_callback_query(call.id)
+    _toggle_idea_selection(call, pending_assign_list, create_assign_list_keyboard)
 
 
-@bot.callback_query_handler(func=lambda call: call.data == 'assign_list_done')
+@callback_route('assign_list_done')
 def handle_assign_list_done(call: telebot.types.CallbackQuery) -> None:
     """Завершение привязки статьи к идеям из общего списка."""
     user_id = call.from_user.id
-    session = pending_assign_list.pop(user_id, None)
-    if not session or not session['selected_ideas']:
+    cancel_markup_edit(call.message.chat.id, call.message.message_id)
+    with user_session(user_id):
+        session = pending_assign_list.pop(user_id)
+        selected_ideas = list(session['selected_ideas']) if session else []
+    if not selected_ideas:
         bot.answer_callback_query(call.id, MSG_ASSIGN_CANCELLED)
         return
-    for idea_id in session['selected_ideas']:
-        link_article_to_idea(session['article_id'], idea_id, user_id)
+    link_article_to_ideas(session['article_id'], selected_ideas, user_id)
     logger.info(
         'Привязка из /articles завершена: user_id=%s, article_id=%d, ideas=%s',
-        user_id, session['article_id'], list(session['selected_ideas']),
+        user_id, session['article_id'], selected_ideas,
     )
     bot.edit_message_text(MSG_ASSIGN_DONE, call.message.chat.id, call.message.message_id)
     bot.answer_callback_query(call.id)
 
 
-@bot.callback_query_handler(func=lambda call: call.data == 'assign_list_cancel')
+@callback_route('assign_list_cancel')
 def handle_assign_list_cancel(call: telebot.types.CallbackQuery) -> None:
     """Отмена привязки из общего списка."""
     user_id = call.from_user.id
+    cancel_markup_edit(call.message.chat.id, call.message.message_id)
     pending_assign_list.pop(user_id, None)
     bot.edit_message_text(MSG_ASSIGN_CANCELLED, call.message.chat.id, call.message.message_id)
     bot.answer_callback_query(call.id)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('gen_md:'))
+@callback_route('gen_md:')
 def handle_generate_md(call: telebot.types.CallbackQuery) -> None:
     """Показ существующего .md или генерация нового."""
     user_id = call.from_user.id
-    idea_id = int(call.data.split(':')[1])
+    idea_id = int(call.data.partition(':')[2])
     idea = get_idea_by_id(idea_id, user_id)
     if not idea:
         bot.answer_callback_query(call.id, MSG_IDEA_NOT_FOUND)
@@ -1248,15 +2113,10 @@ def handle_generate_md(call: telebot.types.CallbackQuery) -> None:
         send_long_message(call.message.chat.id, existing_md)
         # Загружаем в сессию для возможности правок
         pending_md_generation[user_id] = {'idea_id': idea_id, 'draft_md': existing_md}
-        keyboard = types.InlineKeyboardMarkup(row_width=3)
-        keyboard.row(
-            types.InlineKeyboardButton(
-                text="Перегенерировать", callback_data=f"regen_md:{idea_id}",
-            ),
-            types.InlineKeyboardButton(
-                text="Замечания", callback_data=f"revise_md:{idea_id}",
-            ),
-        )
+        keyboard = types.InlineKeyboardMarkup(keyboard=[[
+            types.InlineKeyboardButton(text="Перегенерировать", callback_data=f"regen_md:{idea_id}"),
+            types.InlineKeyboardButton(text="Замечания", callback_data=f"revise_md:{idea_id}"),
+        ]])
         bot.send_message(call.message.chat.id, MSG_MD_READY, reply_markup=keyboard)
         return
     # Нет сохранённого — генерируем
@@ -1266,11 +2126,11 @@ def handle_generate_md(call: telebot.types.CallbackQuery) -> None:
     )
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('regen_md:'))
+@callback_route('regen_md:')
 def handle_regen_md(call: telebot.types.CallbackQuery) -> None:
     """Принудительная перегенерация .md."""
     user_id = call.from_user.id
-    idea_id = int(call.data.split(':')[1])
+    idea_id = int(call.data.partition(':')[2])
     idea = get_idea_by_id(idea_id, user_id)
     if not idea:
         bot.answer_callback_query(call.id, MSG_IDEA_NOT_FOUND)
@@ -1283,22 +2143,26 @@ def handle_regen_md(call: telebot.types.CallbackQuery) -> None:
     )
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('approve_md:'))
+@callback_route('approve_md:')
 def handle_approve_md(call: telebot.types.CallbackQuery) -> None:
     """Сохраняет утвержденный .md."""
     user_id = call.from_user.id
-    idea_id = int(call.data.split(':')[1])
-    session = pending_md_generation.get(user_id)
+    idea_id = int(call.data.partition(':')[2])
+    with user_session(user_id):
+        session = pending_md_generation.get(user_id)
+        if session and session['idea_id'] == idea_id:
+            pending_md_generation.pop(user_id)
+            draft_md = session['draft_md']
     if not session or session['idea_id'] != idea_id:
         bot.answer_callback_query(call.id, "Сессия истекла")
         return
-    update_idea_md(idea_id, user_id, session['draft_md'])
-    pending_md_generation.pop(user_id, None)
+    # Запись в БД и файл ideas_md/ — в фоне, ответ пользователю не ждёт диска
+    write_in_background(update_idea_md, idea_id, user_id, draft_md)
     bot.edit_message_text(MSG_MD_APPROVED, call.message.chat.id, call.message.message_id)
     bot.answer_callback_query(call.id)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('revise_md:'))
+@callback_route('revise_md:')
 def handle_revise_md(call: telebot.types.CallbackQuery) -> None:
     """Запрос замечаний для переработки .md."""
     bot.answer_callback_query(call.id)
@@ -1311,32 +2175,59 @@ def handle_revise_md(call: telebot.types.CallbackQuery) -> None:
 
 def process_md_feedback(message: telebot.types.Message, user_id: int) -> None:
     """Обработка замечаний/правок .md."""
-    session = pending_md_generation.get(user_id)
+    feedback = message.text.strip()
+    with user_session(user_id):
+        session = pending_md_generation.get(user_id)
+        revision_in_progress = bool(session and session.get('revising'))
+        if session and not revision_in_progress:
+            if feedback.startswith('#'):
+                session['draft_md'] = feedback
+            else:
+                session['revising'] = True
     if not session:
         bot.send_message(message.chat.id, "Сессия истекла, начни генерацию заново.")
         return
-    idea_id = session['idea_id']
-    feedback = message.text.strip()
+    if revision_in_progress:
+        bot.send_message(message.chat.id, MSG_MD_REVISION_IN_PROGRESS)
+        return
     if feedback.startswith('#'):
-        session['draft_md'] = feedback
         send_long_message(message.chat.id, feedback)
+        _send_md_review_prompt(message.chat.id, session['idea_id'])
     else:
         bot.send_message(message.chat.id, MSG_MD_REVISING)
-        bot.send_chat_action(message.chat.id, 'typing')
-        md_model, md_provider = get_user_md_model(user_id)
-        try:
+        # Переработка через LLM — в пуле pipeline_executor, поток обработчика telebot не ждёт ответа
+        pipeline_executor.submit(_revise_md, message.chat.id, user_id, session, feedback)
+
+
+def _revise_md(chat_id: int, user_id: int, session: dict, feedback: str) -> None:
+    """
+    Перерабатывает черновик .md по замечаниям и отправляет результат. Выполняется в pipeline_executor.
+
+    Пока флаг session['revising'] установлен, новые правки черновика не принимаются. Если за время
+    переработки сессию утвердили или заменили новой генерацией, результат отбрасывается.
+    """
+    md_model, md_provider = get_user_md_model(user_id)
+    revised = None
+    try:
+        with typing_action(chat_id):
             revised = revise_idea_md(session['draft_md'], feedback, md_model, md_provider)
-        except Exception as e:
-            bot.send_message(message.chat.id, MSG_ERROR.format(error=str(e)))
-            return
-        session['draft_md'] = revised
-        send_long_message(message.chat.id, revised)
-    keyboard = types.InlineKeyboardMarkup(row_width=2)
-    keyboard.row(
-        types.InlineKeyboardButton(text="Утвердить", callback_data=f"approve_md:{idea_id}"),
-        types.InlineKeyboardButton(text="Замечания", callback_data=f"revise_md:{idea_id}"),
-    )
-    bot.send_message(message.chat.id, MSG_MD_READY, reply_markup=keyboard)
+    except Exception as e:
+        logger.error('Ошибка переработки .md для idea_id=%d: %s', session['idea_id'], e)
+        bot.send_message(chat_id, MSG_ERROR.format(error=str(e)))
+    finally:
+        with user_session(user_id):
+            session['revising'] = False
+            is_current = pending_md_generation.get(user_id) is session
+            if revised is not None and is_current:
+                session['draft_md'] = revised
+    if revised is None:
+        return
+    if not is_current:
+        logger.info('Переработка .md отброшена: сессия закрыта, idea_id=%d, user_id=%s',
+                    session['idea_id'], user_id)
+        return
+    send_long_message(chat_id, revised)
+    _send_md_review_prompt(chat_id, session['idea_id'])
 
 
 @bot.message_handler(func=lambda message: True)
@@ -1350,7 +2241,7 @@ def handle_unknown(message: telebot.types.Message) -> None:
 # ========================
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('view_idea:'))
+@callback_route('view_idea:')
 def handle_view_idea(call: telebot.types.CallbackQuery) -> None:
     """
     Обрабатывает нажатие кнопки просмотра идеи.
@@ -1358,7 +2249,7 @@ def handle_view_idea(call: telebot.types.CallbackQuery) -> None:
     Показывает детали идеи с возможностью редактирования и удаления.
     """
     user_id = call.from_user.id
-    idea_id = int(call.data.split(':')[1])
+    idea_id = int(call.data.partition(':')[2])
 
     idea = get_idea_by_id(idea_id, user_id)
 
@@ -1366,40 +2257,18 @@ def handle_view_idea(call: telebot.types.CallbackQuery) -> None:
         bot.answer_callback_query(call.id, MSG_IDEA_NOT_FOUND)
         return
 
-    # Формируем сообщение с деталями идеи
-    idea_text = f"**{idea['name']}**\n\n{idea['description'] or '(нет описания)'}"
-
-    # Создаём клавиатуру с кнопками
-    keyboard = types.InlineKeyboardMarkup(row_width=2)
-    articles_btn = types.InlineKeyboardButton(
-        text="📚 Статьи",
-        callback_data=f"idea_articles:{idea_id}",
-    )
-    edit_btn = types.InlineKeyboardButton(
-        text="✏️ Редактировать",
-        callback_data=f"edit_idea:{idea_id}",
-    )
-    delete_btn = types.InlineKeyboardButton(
-        text="🗑️ Удалить",
-        callback_data=f"delete_idea:{idea_id}",
-    )
-    generate_md_btn = types.InlineKeyboardButton(
-        text="Описание (.md)",
-        callback_data=f"gen_md:{idea_id}",
-    )
-    keyboard.row(articles_btn, generate_md_btn)
-    keyboard.row(edit_btn, delete_btn)
-
+    # Ответ на callback уходит в фоне параллельно с правкой сообщения: порядок между ними не важен,
+    # а правки одного сообщения остаются последовательными
+    call_in_background(bot.answer_callback_query, call.id)
     bot.edit_message_text(
-        idea_text,
+        format_idea_card(idea),
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
-        reply_markup=keyboard,
+        reply_markup=create_idea_keyboard(idea_id),
     )
-    bot.answer_callback_query(call.id)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('idea_articles:'))
+@callback_route('idea_articles:')
 def handle_idea_articles(call: telebot.types.CallbackQuery) -> None:
     """
     Показывает список статей, привязанных к идее.
@@ -1407,82 +2276,85 @@ def handle_idea_articles(call: telebot.types.CallbackQuery) -> None:
     Callback data формат: idea_articles:{idea_id}
     """
     user_id = call.from_user.id
-    idea_id = int(call.data.split(':')[1])
+    idea_id = int(call.data.partition(':')[2])
 
-    idea = get_idea_by_id(idea_id, user_id)
+    # Идея и её статьи — одним запросом
+    idea = get_idea_with_articles(idea_id, user_id)
     if not idea:
         bot.answer_callback_query(call.id, MSG_IDEA_NOT_FOUND)
         return
 
-    articles = get_articles_by_idea(idea_id, user_id)
+    call_in_background(bot.answer_callback_query, call.id)
+    _show_idea_articles(call.message, idea)
+
+
+def _shorten(text: str, limit: int) -> str:
+    """Обрезает text до limit символов с многоточием (для надписей на кнопках)."""
+    return text[:limit] + "..." if len(text) > limit else text
+
+
+def _show_idea_articles(message: telebot.types.Message, idea: dict) -> None:
+    """
+    Заменяет сообщение списком статей идеи с кнопками конспекта, отвязки и перепривязки.
+
+    Args:
+        message: сообщение с inline-клавиатурой, которое редактируется
+        idea: результат get_idea_with_articles() / unlink_and_fetch_articles()
+    """
+    idea_id = idea['id']
+    articles = idea['articles']
 
     if not articles:
         # Нет статей — показываем сообщение с кнопкой "Назад"
-        keyboard = types.InlineKeyboardMarkup()
         back_btn = types.InlineKeyboardButton(
             text="⬅️ Назад",
             callback_data=f"view_idea:{idea_id}",
         )
-        keyboard.add(back_btn)
+        keyboard = types.InlineKeyboardMarkup(keyboard=[[back_btn]])
 
         bot.edit_message_text(
             MSG_IDEA_NO_ARTICLES,
-            chat_id=call.message.chat.id,
-            message_id=call.message.message_id,
+            chat_id=message.chat.id,
+            message_id=message.message_id,
             reply_markup=keyboard,
         )
-        bot.answer_callback_query(call.id)
         return
 
-    # Формируем список статей с кнопками
-    keyboard = types.InlineKeyboardMarkup(row_width=2)
-
-    for idx, article in enumerate(articles, 1):
-        article_id = article['id']
-        title = article['title'][:25] + "..." if len(article['title']) > 25 else article['title']
-
-        # Кнопка "Конспект" и "Отвязать" для каждой статьи
-        summary_btn = types.InlineKeyboardButton(
-            text=f"📄 {idx}. {title}",
-            callback_data=f"show_summary:{article_id}:{idea_id}",
-        )
-        unlink_btn = types.InlineKeyboardButton(
-            text="🔗❌",
-            callback_data=f"unlink:{article_id}:{idea_id}",
-        )
-        reassign_btn = types.InlineKeyboardButton(
-            text="->",
-            callback_data=f"reassign:{article_id}:{idea_id}",
-        )
-        keyboard.row(summary_btn, unlink_btn, reassign_btn)
-
+    # Формируем список статей с кнопками: строка «Конспект» / «Отвязать» / «Перепривязать» на статью
+    rows = [
+        [
+            types.InlineKeyboardButton(
+                text=f"📄 {idx}. {_shorten(article['title'], 25)}",
+                callback_data=f"show_summary:{article['id']}:{idea_id}",
+            ),
+            types.InlineKeyboardButton(text="🔗❌", callback_data=f"unlink:{article['id']}:{idea_id}"),
+            types.InlineKeyboardButton(text="->", callback_data=f"reassign:{article['id']}:{idea_id}"),
+        ]
+        for idx, article in enumerate(articles, 1)
+    ]
     # Кнопка "Назад"
-    back_btn = types.InlineKeyboardButton(
-        text="⬅️ Назад к идее",
-        callback_data=f"view_idea:{idea_id}",
-    )
-    keyboard.add(back_btn)
+    rows.append([types.InlineKeyboardButton(text="⬅️ Назад к идее", callback_data=f"view_idea:{idea_id}")])
+    keyboard = types.InlineKeyboardMarkup(keyboard=rows)
 
     bot.edit_message_text(
         MSG_IDEA_ARTICLES_TITLE.format(name=idea['name']),
-        chat_id=call.message.chat.id,
-        message_id=call.message.message_id,
+        chat_id=message.chat.id,
+        message_id=message.message_id,
         reply_markup=keyboard,
     )
-    bot.answer_callback_query(call.id)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('show_summary:'))
+@callback_route('show_summary:')
 def handle_show_summary(call: telebot.types.CallbackQuery) -> None:
     """
     Показывает конспект статьи.
 
     Callback data формат: show_summary:{article_id}:{idea_id}
     """
-    parts = call.data.split(':')
-    article_id = int(parts[1])
+    _, _, rest = call.data.partition(':')
+    article_id = int(rest.partition(':')[0])
 
-    article = get_article_by_id(article_id)
+    article = get_article_summary(article_id)
     if not article:
         bot.answer_callback_query(call.id, "Статья не найдена")
         return
@@ -1495,14 +2367,10 @@ def handle_show_summary(call: telebot.types.CallbackQuery) -> None:
     header = f"📄 **{title}**\n🔗 {url}\n\n"
     bot.answer_callback_query(call.id)
 
-    if len(header) + len(summary) <= TELEGRAM_MAX_MESSAGE_LENGTH:
-        bot.send_message(call.message.chat.id, header + summary)
-    else:
-        bot.send_message(call.message.chat.id, header)
-        send_long_message(call.message.chat.id, summary)
+    send_with_header(call.message.chat.id, header, summary)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('unlink:'))
+@callback_route('unlink:')
 def handle_unlink_article(call: telebot.types.CallbackQuery) -> None:
     """
     Отвязывает статью от идеи.
@@ -1510,22 +2378,22 @@ def handle_unlink_article(call: telebot.types.CallbackQuery) -> None:
     Callback data формат: unlink:{article_id}:{idea_id}
     """
     user_id = call.from_user.id
-    parts = call.data.split(':')
-    article_id = int(parts[1])
-    idea_id = int(parts[2])
+    _, _, rest = call.data.partition(':')
+    article_id, _, idea_id = rest.partition(':')
+    article_id, idea_id = int(article_id), int(idea_id)
 
-    success = unlink_article_from_idea(article_id, idea_id, user_id)
+    # Отвязка и обновлённый список статей — одним обращением к БД
+    success, idea = unlink_and_fetch_articles(article_id, idea_id, user_id)
 
     if success:
-        bot.answer_callback_query(call.id, MSG_ARTICLE_UNLINKED)
-        # Обновляем список статей — симулируем нажатие на "Статьи"
-        call.data = f"idea_articles:{idea_id}"
-        handle_idea_articles(call)
+        call_in_background(bot.answer_callback_query, call.id, MSG_ARTICLE_UNLINKED)
+        if idea:
+            _show_idea_articles(call.message, idea)
     else:
         bot.answer_callback_query(call.id, "Не удалось отвязать статью")
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('edit_idea:'))
+@callback_route('edit_idea:')
 def handle_edit_idea(call: telebot.types.CallbackQuery) -> None:
     """
     Обрабатывает нажатие кнопки редактирования идеи.
@@ -1533,7 +2401,7 @@ def handle_edit_idea(call: telebot.types.CallbackQuery) -> None:
     Запрашивает новое название, затем новое описание.
     """
     user_id = call.from_user.id
-    idea_id = int(call.data.split(':')[1])
+    idea_id = int(call.data.partition(':')[2])
 
     # Получаем текущую идею для отображения
     idea = get_idea_by_id(idea_id, user_id)
@@ -1596,6 +2464,7 @@ def process_edit_description(message: telebot.types.Message, user_id: int, idea_
 
     try:
         success = update_idea(idea_id, user_id, name=new_name, description=new_description)
+        bump_ideas_version(user_id)
         if success:
             bot.send_message(message.chat.id, MSG_IDEA_UPDATED.format(name=new_name))
             # Перегенерация .md при изменении описания
@@ -1610,7 +2479,7 @@ def process_edit_description(message: telebot.types.Message, user_id: int, idea_
         logger.error('Ошибка обновления идеи для %s: %s', user_id, e)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('delete_idea:'))
+@callback_route('delete_idea:')
 def handle_delete_idea(call: telebot.types.CallbackQuery) -> None:
     """
     Обрабатывает нажатие кнопки удаления идеи.
@@ -1618,7 +2487,7 @@ def handle_delete_idea(call: telebot.types.CallbackQuery) -> None:
     Запрашивает подтверждение перед удалением.
     """
     user_id = call.from_user.id
-    idea_id = int(call.data.split(':')[1])
+    idea_id = int(call.data.partition(':')[2])
 
     # Проверяем существование идеи
     idea = get_idea_by_id(idea_id, user_id)
@@ -1626,37 +2495,26 @@ def handle_delete_idea(call: telebot.types.CallbackQuery) -> None:
         bot.answer_callback_query(call.id, MSG_IDEA_NOT_FOUND)
         return
 
-    # Создаём клавиатуру подтверждения
-    keyboard = types.InlineKeyboardMarkup(row_width=1)
-    confirm_btn = types.InlineKeyboardButton(
-        text="Да",
-        callback_data=f"confirm_delete:{idea_id}",
-    )
-    cancel_btn = types.InlineKeyboardButton(
-        text="Отмена",
-        callback_data=f"cancel_delete:{idea_id}",
-    )
-    keyboard.add(confirm_btn, cancel_btn)
-
     bot.edit_message_text(
         MSG_IDEA_CONFIRM_DELETE,
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
-        reply_markup=keyboard,
+        reply_markup=create_confirm_delete_keyboard(idea_id),
     )
     bot.answer_callback_query(call.id)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('confirm_delete:'))
+@callback_route('confirm_delete:')
 def handle_confirm_delete(call: telebot.types.CallbackQuery) -> None:
     """
     Обрабатывает подтверждение удаления идеи.
     """
     user_id = call.from_user.id
-    idea_id = int(call.data.split(':')[1])
+    idea_id = int(call.data.partition(':')[2])
 
     try:
         success = delete_idea(idea_id, user_id)
+        bump_ideas_version(user_id)
         if success:
             bot.edit_message_text(
                 MSG_IDEA_DELETED,
@@ -1678,42 +2536,25 @@ def handle_confirm_delete(call: telebot.types.CallbackQuery) -> None:
         logger.error('Ошибка удаления идеи для %s: %s', user_id, e)
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith('cancel_delete:'))
+@callback_route('cancel_delete:')
 def handle_cancel_delete(call: telebot.types.CallbackQuery) -> None:
     """
     Обрабатывает отмену удаления идеи.
     """
-    idea_id = int(call.data.split(':')[1])
+    idea_id = int(call.data.partition(':')[2])
 
     # Получаем обновлённую информацию об идее
     user_id = call.from_user.id
     idea = get_idea_by_id(idea_id, user_id)
+    call_in_background(bot.answer_callback_query, call.id)
 
     if idea:
         # Возвращаемся к просмотру деталей идеи
-        idea_text = f"**{idea['name']}**\n\n{idea['description'] or '(нет описания)'}"
-
-        keyboard = types.InlineKeyboardMarkup(row_width=2)
-        articles_btn = types.InlineKeyboardButton(
-            text="📚 Статьи",
-            callback_data=f"idea_articles:{idea_id}",
-        )
-        edit_btn = types.InlineKeyboardButton(
-            text="✏️ Редактировать",
-            callback_data=f"edit_idea:{idea_id}",
-        )
-        delete_btn = types.InlineKeyboardButton(
-            text="🗑️ Удалить",
-            callback_data=f"delete_idea:{idea_id}",
-        )
-        keyboard.row(articles_btn)
-        keyboard.row(edit_btn, delete_btn)
-
         bot.edit_message_text(
-            idea_text,
+            format_idea_card(idea),
             chat_id=call.message.chat.id,
             message_id=call.message.message_id,
-            reply_markup=keyboard,
+            reply_markup=create_idea_keyboard(idea_id),
         )
     else:
         bot.edit_message_text(
@@ -1722,7 +2563,49 @@ def handle_cancel_delete(call: telebot.types.CallbackQuery) -> None:
             message_id=call.message.message_id,
         )
 
-    bot.answer_callback_query(call.id)
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Принимает POST от Telegram и передаёт обновления в bot.process_new_updates()."""
+
+    def do_POST(self) -> None:
+        if urlsplit(self.path).path != WEBHOOK_PATH:
+            self.send_error(404)
+            return
+        secret = self.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(secret.encode(), WEBHOOK_SECRET.encode()):
+            self.send_error(403)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length)
+        # Отвечаем сразу: обработка идёт в пуле потоков telebot
+        self.send_response(200)
+        self.end_headers()
+        try:
+            update = types.Update.de_json(raw.decode('utf-8'))
+            if update:
+                bot.process_new_updates([update])
+        except Exception:
+            logger.exception('Webhook: не удалось обработать обновление (%d байт)', length)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug('Webhook: ' + format, *args)
+
+
+def run_webhook() -> None:
+    """
+    Регистрирует webhook в Telegram и запускает HTTP-сервер для приёма обновлений.
+
+    TLS предполагается на стороне reverse proxy (nginx, caddy и т.п.),
+    который проксирует WEBHOOK_URL + WEBHOOK_PATH на WEBHOOK_HOST:WEBHOOK_PORT.
+    """
+    bot.remove_webhook()
+    bot.set_webhook(url=f'{WEBHOOK_URL}{WEBHOOK_PATH}', secret_token=WEBHOOK_SECRET, drop_pending_updates=True)
+    server = ThreadingHTTPServer((WEBHOOK_HOST, WEBHOOK_PORT), WebhookHandler)
+    logger.info('Webhook: %s%s, слушаю %s:%d', WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
 
 
 def main() -> None:
@@ -1753,7 +2636,12 @@ def main() -> None:
     logger.info("Бот запущен")
 
     atexit.register(lambda: logger.info("Бот остановлен"))
-    bot.infinity_polling(timeout=60, long_polling_timeout=60)
+    if WEBHOOK_URL and not USE_POLLING:
+        run_webhook()
+    else:
+        bot.remove_webhook()
+        # Обновления, накопившиеся за время простоя, пропускаем, чтобы не получить их пачкой при старте
+        bot.infinity_polling(timeout=60, long_polling_timeout=60, skip_pending=True)
 
 
 if __name__ == '__main__':
@@ -6,10 +6,13 @@
     - article_exists(url) - проверка наличия статьи в БД
     - get_cached_summary(url) - получение сохранённого конспекта
     - get_article_by_url(url) - получение статьи по URL
+    - find_article_id_by_url(url) - ID статьи по URL без чтения остальных полей
     - get_article_by_id(id) - получение статьи по ID
+    - get_article_owner(id) - user_id пользователя, сохранившего статью
+    - get_article_summary(id) - заголовок, URL и конспект статьи без остальных полей
     - save_article(...) - сохранение статьи с конспектом
     - update_article(...) - обновление конспекта существующей статьи
-    - delete_article(id) - удаление статьи по ID
+    - delete_article(id, user_id=None) - удаление статьи по ID (с проверкой ownership, если передан user_id)
 
 Функции для идей (ideas):
     - create_idea(...) - создание новой идеи
@@ -20,11 +23,21 @@
 
 Функции для связи статей и идей (idea_articles):
     - link_article_to_idea(...) - привязка статьи к идее
+    - link_article_to_ideas(...) - привязка статьи к нескольким идеям одной транзакцией
+    - reassign_article(...) - перепривязка статьи к другим идеям одной транзакцией
     - unlink_article_from_idea(...) - отвязка статьи от идеи
+    - unlink_and_fetch_articles(...) - отвязка и обновлённый список статей идеи на одном подключении
     - get_articles_by_idea(...) - получение статей идеи
+    - get_idea_with_articles(...) - название идеи и её статьи одним запросом
     - get_ideas_by_article(...) - получение идей статьи
+    - get_article_ideas_map(user_id) - идеи всех статей пользователя одним запросом
     - get_user_articles(user_id) - получение всех статей пользователя
 
+Функции для настроек пользователя (user_model_config):
+    - get_user_model_config(user_id, kind) - выбранные провайдер и модель
+    - get_user_model_configs(user_id) - выбор моделей всех назначений одним запросом
+    - set_user_model_config(...) - сохранение выбора модели
+
 Example для статей:
     >>> from database import init_db, article_exists, save_article
     >>> init_db()
@@ -35,7 +48,9 @@ Example для статей:
 import logging
 import os
 import sqlite3
+import threading
 import time
+from collections import OrderedDict
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -47,7 +62,10 @@ __all__ = [
     'article_exists',
     'get_cached_summary',
     'get_article_by_url',
+    'find_article_id_by_url',
     'get_article_by_id',
+    'get_article_owner',
+    'get_article_summary',
     'save_article',
     'update_article',
     'delete_article',
@@ -59,18 +77,48 @@ __all__ = [
     'delete_idea',
     # Таблица idea_articles
     'link_article_to_idea',
+    'link_article_to_ideas',
+    'reassign_article',
     'unlink_article_from_idea',
+    'unlink_and_fetch_articles',
     'get_articles_by_idea',
+    'get_idea_with_articles',
     'get_ideas_by_article',
+    'get_article_ideas_map',
     'get_user_articles',
     'update_idea_md',
     'get_idea_md',
+    # Таблица user_model_config
+    'get_user_model_config',
+    'get_user_model_configs',
+    'set_user_model_config',
 ]
 
 # Путь к базе данных
 DATA_DIR = 'data'
 DB_PATH = os.path.join(DATA_DIR, 'study_agent.db')
 
+# Настройки подключения, выполняются один раз при его создании.
+# journal_mode=WAL хранится в файле БД и включается в init_db()
+CONNECTION_PRAGMAS: tuple[str, ...] = (
+    'PRAGMA synchronous=NORMAL',  # В режиме WAL fsync только при checkpoint, а не на каждый commit
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',  # 256 МБ
+    'PRAGMA cache_size=-8000',  # 8 МБ на подключение
+)
+
+# Подключение текущего потока (см. _get_connection())
+_thread_local = threading.local()
+
+# Кеш get_idea_by_id(): карточка идеи, её статьи и возврат к ней перечитывают одну и ту же строку.
+# Формат: {(idea_id, user_id): (истекает_в, строка)}; функции записи идей сбрасывают затронутую запись
+IDEA_CACHE_TTL = 30.0  # сек
+IDEA_CACHE_SIZE = 256
+_idea_cache: OrderedDict[tuple[int, int], tuple[float, dict]] = OrderedDict()
+_idea_cache_lock = threading.Lock()
+# Растёт при каждом сбросе: строка, прочитанная до сброса, в кеш уже не попадает
+_idea_cache_generation = 0
+
 # SQL для создания таблицы
 CREATE_TABLE_SQL = """
 CREATE TABLE IF NOT EXISTS articles (
@@ -101,7 +149,10 @@ CREATE TABLE IF NOT EXISTS articles (
 
 CREATE_INDEXES_SQL = """
 CREATE INDEX IF NOT EXISTS idx_articles_url ON articles(url);
-CREATE INDEX IF NOT EXISTS idx_articles_user_id ON articles(user_id);
+-- Статьи пользователя в порядке get_user_articles() без отдельной сортировки;
+-- заменяет индекс только по user_id (его префикс)
+CREATE INDEX IF NOT EXISTS idx_articles_user_processed ON articles(user_id, processed_at);
+DROP INDEX IF EXISTS idx_articles_user_id;
 """
 
 # SQL для таблицы ideas
@@ -117,7 +168,9 @@ CREATE TABLE IF NOT EXISTS ideas (
 """
 
 CREATE_IDEAS_INDEXES_SQL = """
-CREATE INDEX IF NOT EXISTS idx_ideas_user_id ON ideas(user_id);
+-- Идеи пользователя в порядке get_user_ideas() без отдельной сортировки
+CREATE INDEX IF NOT EXISTS idx_ideas_user_created ON ideas(user_id, created_at);
+DROP INDEX IF EXISTS idx_ideas_user_id;
 """
 
 # SQL для таблицы idea_articles (связь статей и идей)
@@ -138,23 +191,89 @@ CREATE TABLE IF NOT EXISTS idea_articles (
 """
 
 CREATE_IDEA_ARTICLES_INDEXES_SQL = """
-CREATE INDEX IF NOT EXISTS idx_idea_articles_idea_id ON idea_articles(idea_id);
+-- Статьи идеи в порядке added_at (список статей идеи) без отдельной сортировки;
+-- поиск по (idea_id, article_id) обслуживает индекс UNIQUE (idea_id, article_id)
+CREATE INDEX IF NOT EXISTS idx_idea_articles_idea_added ON idea_articles(idea_id, added_at);
+DROP INDEX IF EXISTS idx_idea_articles_idea_id;
 CREATE INDEX IF NOT EXISTS idx_idea_articles_article_id ON idea_articles(article_id);
 """
 
+# SQL для таблицы user_model_config (выбор модели пользователем, kind: 'summary' | 'md')
+CREATE_USER_MODEL_CONFIG_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS user_model_config (
+    user_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    PRIMARY KEY (user_id, kind)
+);
+"""
+
 
 def _get_connection() -> sqlite3.Connection:
     """
-    Создаёт подключение к базе данных.
+    Возвращает подключение к базе данных текущего потока.
+
+    Подключение создаётся при первом вызове в потоке и живёт вместе с потоком,
+    поэтому функции модуля не открывают файл БД на каждый запрос. Функции
+    завершают работу с подключением через _release_connection(), а не close().
 
     Returns:
         sqlite3.Connection с row_factory = sqlite3.Row
     """
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = getattr(_thread_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        _thread_local.conn = conn
     return conn
 
 
+def _release_connection(conn: sqlite3.Connection) -> None:
+    """
+    Завершает работу функции с подключением потока, не закрывая его.
+
+    Изменения, не зафиксированные через commit() (функция завершилась ошибкой),
+    откатываются, чтобы не попасть в транзакцию следующего вызова.
+    """
+    if conn.in_transaction:
+        conn.rollback()
+
+
+def _idea_cache_get(key: tuple[int, int]) -> dict | None:
+    """Возвращает копию идеи из кеша или None, если её нет или она устарела."""
+    with _idea_cache_lock:
+        item = _idea_cache.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic():
+            del _idea_cache[key]
+            return None
+        _idea_cache.move_to_end(key)
+        return dict(item[1])
+
+
+def _idea_cache_put(key: tuple[int, int], idea: dict, generation: int) -> None:
+    """Кладёт идею в кеш, если с начала её чтения (generation) не было сброса."""
+    with _idea_cache_lock:
+        if generation != _idea_cache_generation:
+            return
+        _idea_cache[key] = (time.monotonic() + IDEA_CACHE_TTL, dict(idea))
+        _idea_cache.move_to_end(key)
+        while len(_idea_cache) > IDEA_CACHE_SIZE:
+            _idea_cache.popitem(last=False)
+
+
+def _idea_cache_invalidate(key: tuple[int, int]) -> None:
+    """Удаляет идею key из кеша. Вызывается после commit."""
+    global _idea_cache_generation
+    with _idea_cache_lock:
+        _idea_cache_generation += 1
+        _idea_cache.pop(key, None)
+
+
 def init_db() -> None:
     """
     Инициализирует базу данных, создаёт таблицы и индексы если их нет.
@@ -168,6 +287,8 @@ def init_db() -> None:
 
     conn = _get_connection()
     try:
+        # WAL: чтение не блокируется записью из другого потока; режим сохраняется в файле БД
+        conn.execute('PRAGMA journal_mode=WAL')
         cursor = conn.cursor()
         cursor.executescript(CREATE_TABLE_SQL)
         cursor.executescript(CREATE_INDEXES_SQL)
@@ -175,6 +296,7 @@ def init_db() -> None:
         cursor.executescript(CREATE_IDEAS_INDEXES_SQL)
         cursor.executescript(CREATE_IDEA_ARTICLES_TABLE_SQL)
         cursor.executescript(CREATE_IDEA_ARTICLES_INDEXES_SQL)
+        cursor.executescript(CREATE_USER_MODEL_CONFIG_TABLE_SQL)
         conn.commit()
         # Миграция: добавляем поле generated_md в ideas
         try:
@@ -185,7 +307,7 @@ def init_db() -> None:
             pass
         logger.info("База данных инициализирована: %s", DB_PATH)
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
 def article_exists(url: str, user_id: int | None = None) -> bool:
@@ -205,7 +327,7 @@ def article_exists(url: str, user_id: int | None = None) -> bool:
         cursor.execute('SELECT 1 FROM articles WHERE url = ?', (url,))
         return cursor.fetchone() is not None
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
 def get_cached_summary(url: str) -> str | None:
@@ -225,7 +347,7 @@ def get_cached_summary(url: str) -> str | None:
         row = cursor.fetchone()
         return row['summary'] if row else None
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
 def get_article_by_url(url: str) -> dict | None:
@@ -245,7 +367,49 @@ def get_article_by_url(url: str) -> dict | None:
         row = cursor.fetchone()
         return dict(row) if row else None
     finally:
-        conn.close()
+        _release_connection(conn)
+
+
+def find_article_id_by_url(url: str) -> int | None:
+    """
+    Получает ID статьи по URL.
+
+    В отличие от get_article_by_url() не читает content и summary.
+
+    Args:
+        url: URL статьи
+
+    Returns:
+        ID статьи или None если не найдена
+    """
+    conn = _get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id FROM articles WHERE url = ?', (url,))
+        row = cursor.fetchone()
+        return row['id'] if row else None
+    finally:
+        _release_connection(conn)
+
+
+def get_article_owner(article_id: int) -> int | None:
+    """
+    Получает user_id пользователя, сохранившего статью.
+
+    Args:
+        article_id: ID статьи в таблице articles
+
+    Returns:
+        user_id или None если статья не найдена или сохранена без пользователя
+    """
+    conn = _get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT user_id FROM articles WHERE id = ?', (article_id,))
+        row = cursor.fetchone()
+        return row['user_id'] if row else None
+    finally:
+        _release_connection(conn)
 
 
 def get_article_by_id(article_id: int) -> dict | None:
@@ -265,7 +429,29 @@ def get_article_by_id(article_id: int) -> dict | None:
         row = cursor.fetchone()
         return dict(row) if row else None
     finally:
-        conn.close()
+        _release_connection(conn)
+
+
+def get_article_summary(article_id: int) -> dict | None:
+    """
+    Получает заголовок, URL и конспект статьи по ID.
+
+    В отличие от get_article_by_id() не читает content (полный текст статьи).
+
+    Args:
+        article_id: ID статьи
+
+    Returns:
+        {'title', 'url', 'summary'} или None если статья не найдена
+    """
+    conn = _get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT title, url, summary FROM articles WHERE id = ?', (article_id,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    finally:
+        _release_connection(conn)
 
 
 def save_article(
@@ -345,7 +531,7 @@ def save_article(
                     article_id, article_data.get('url', '')[:80], elapsed)
         return article_id
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
 def update_article(
@@ -383,10 +569,10 @@ def update_article(
             logger.debug("Статья обновлена: url=%s", url[:80])
         return updated
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
-def delete_article(article_id: int) -> bool:
+def delete_article(article_id: int, user_id: int | None = None) -> bool:
     """
     Удаляет статью из базы данных по её ID.
 
@@ -395,24 +581,25 @@ def delete_article(article_id: int) -> bool:
 
     Args:
         article_id: ID статьи в таблице articles
+        user_id: если передан, статья удаляется только когда принадлежит этому пользователю
 
     Returns:
-        True если статья найдена и удалена, False если не найдена
+        True если статья найдена и удалена, False если не найдена (или принадлежит другому пользователю)
     """
     conn = _get_connection()
     try:
         cursor = conn.cursor()
-        cursor.execute(
-            'DELETE FROM articles WHERE id = ?',
-            (article_id,),
-        )
+        if user_id is None:
+            cursor.execute('DELETE FROM articles WHERE id = ?', (article_id,))
+        else:
+            cursor.execute('DELETE FROM articles WHERE id = ? AND user_id = ?', (article_id, user_id))
         conn.commit()
         deleted = cursor.rowcount > 0
         if deleted:
             logger.debug("Статья удалена: id=%d", article_id)
         return deleted
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
 # ========================
@@ -448,7 +635,7 @@ def create_idea(name: str, description: str | None, user_id: int) -> int:
         logger.info("Идея создана: id=%d, name=%s, user_id=%d", idea_id, name, user_id)
         return idea_id
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
 def get_user_ideas(user_id: int) -> list[dict]:
@@ -476,7 +663,7 @@ def get_user_ideas(user_id: int) -> list[dict]:
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
 def get_idea_by_id(idea_id: int, user_id: int) -> dict | None:
@@ -490,6 +677,11 @@ def get_idea_by_id(idea_id: int, user_id: int) -> dict | None:
     Returns:
         dict с полями идеи или None если не найдена или не принадлежит пользователю
     """
+    key = (idea_id, user_id)
+    cached = _idea_cache_get(key)
+    if cached is not None:
+        return cached
+    generation = _idea_cache_generation
     conn = _get_connection()
     try:
         cursor = conn.cursor()
@@ -502,9 +694,13 @@ def get_idea_by_id(idea_id: int, user_id: int) -> dict | None:
             (idea_id, user_id),
         )
         row = cursor.fetchone()
-        return dict(row) if row else None
+        if row is None:
+            return None
+        idea = dict(row)
+        _idea_cache_put(key, idea, generation)
+        return idea
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
 def update_idea(
@@ -525,38 +721,29 @@ def update_idea(
     Returns:
         True если обновление прошло успешно, False если идея не найдена или не принадлежит пользователю
     """
-    # Собираем только те поля, которые нужно обновить
-    updates = []
-    params = []
-    if name is not None:
-        updates.append('name = ?')
-        params.append(name)
-    if description is not None:
-        updates.append('description = ?')
-        params.append(description)
-
-    if not updates:
+    if name is None and description is None:
         return False
 
-    updates.append('updated_at = ?')
-    params.append(datetime.now().isoformat())
-    params.extend([idea_id, user_id])
-
     conn = _get_connection()
     try:
         cursor = conn.cursor()
+        # Один постоянный текст запроса для любого набора полей: None оставляет поле
+        # без изменений (COALESCE), а подготовленный запрос берётся из кеша подключения
         cursor.execute(
-            f"""
+            """
             UPDATE ideas
-            SET {', '.join(updates)}
+            SET name = COALESCE(?, name),
+                description = COALESCE(?, description),
+                updated_at = ?
             WHERE id = ? AND user_id = ?
             """,
-            params,
+            (name, description, datetime.now().isoformat(), idea_id, user_id),
         )
         conn.commit()
+        _idea_cache_invalidate((idea_id, user_id))
         return cursor.rowcount > 0
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
 def delete_idea(idea_id: int, user_id: int) -> bool:
@@ -580,10 +767,11 @@ def delete_idea(idea_id: int, user_id: int) -> bool:
         conn.commit()
         deleted = cursor.rowcount > 0
         if deleted:
+            _idea_cache_invalidate((idea_id, user_id))
             logger.debug("Идея удалена: id=%d, user_id=%d", idea_id, user_id)
         return deleted
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
 # ========================
@@ -640,7 +828,111 @@ def link_article_to_idea(article_id: int, idea_id: int, user_id: int) -> bool:
             logger.warning("Связь уже существует: article_id=%d, idea_id=%d", article_id, idea_id)
             return False
     finally:
-        conn.close()
+        _release_connection(conn)
+
+
+def _link_article_to_ideas(
+    cursor: sqlite3.Cursor,
+    article_id: int,
+    idea_ids: list[int],
+    user_id: int,
+) -> list[dict]:
+    """
+    Привязывает статью к идеям в рамках переданного курсора (без commit).
+
+    Returns:
+        Список {'id', 'name'} идей, к которым статья привязана этим вызовом
+    """
+    if not idea_ids:
+        return []
+
+    # Проверяем ownership статьи (user_id может быть NULL для старых статей)
+    cursor.execute(
+        'SELECT 1 FROM articles WHERE id = ? AND (user_id = ? OR user_id IS NULL)',
+        (article_id, user_id),
+    )
+    if not cursor.fetchone():
+        return []
+
+    # Идеи пользователя из выбранных, без уже существующих привязок — одним запросом
+    placeholders = ', '.join('?' * len(idea_ids))
+    cursor.execute(
+        f"""
+        SELECT id, name FROM ideas
+        WHERE user_id = ? AND id IN ({placeholders})
+          AND id NOT IN (SELECT idea_id FROM idea_articles WHERE article_id = ?)
+        """,
+        (user_id, *idea_ids, article_id),
+    )
+    ideas = [dict(row) for row in cursor.fetchall()]
+
+    added_at = datetime.now().isoformat()
+    cursor.executemany(
+        """
+        INSERT OR IGNORE INTO idea_articles (idea_id, article_id, user_confirmed, added_at)
+        VALUES (?, ?, 1, ?)
+        """,
+        [(idea['id'], article_id, added_at) for idea in ideas],
+    )
+    return ideas
+
+
+def link_article_to_ideas(article_id: int, idea_ids: list[int], user_id: int) -> list[dict]:
+    """
+    Привязывает статью к нескольким идеям одной транзакцией с проверкой ownership.
+
+    Чужие идеи и уже существующие привязки пропускаются.
+
+    Args:
+        article_id: ID статьи
+        idea_ids: ID идей
+        user_id: ID пользователя для проверки владения
+
+    Returns:
+        Список {'id', 'name'} идей, к которым статья привязана
+    """
+    conn = _get_connection()
+    try:
+        ideas = _link_article_to_ideas(conn.cursor(), article_id, idea_ids, user_id)
+        conn.commit()
+        logger.debug("Статья привязана к идеям: article_id=%d, idea_ids=%s", article_id, [i['id'] for i in ideas])
+        return ideas
+    finally:
+        _release_connection(conn)
+
+
+def reassign_article(article_id: int, source_idea_id: int, idea_ids: list[int], user_id: int) -> list[dict]:
+    """
+    Перепривязывает статью: привязывает к idea_ids и отвязывает от source_idea_id одной транзакцией.
+
+    Args:
+        article_id: ID статьи
+        source_idea_id: ID идеи, от которой статья отвязывается
+        idea_ids: ID новых идей
+        user_id: ID пользователя для проверки владения
+
+    Returns:
+        Список {'id', 'name'} идей, к которым статья привязана
+    """
+    conn = _get_connection()
+    try:
+        cursor = conn.cursor()
+        ideas = _link_article_to_ideas(cursor, article_id, idea_ids, user_id)
+        cursor.execute(
+            """
+            DELETE FROM idea_articles
+            WHERE idea_id = ? AND article_id = ?
+              AND idea_id IN (SELECT id FROM ideas WHERE user_id = ?)
+            """,
+            (source_idea_id, article_id, user_id),
+        )
+        conn.commit()
+        return ideas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _release_connection(conn)
 
 
 def unlink_article_from_idea(article_id: int, idea_id: int, user_id: int) -> bool:
@@ -674,7 +966,7 @@ def unlink_article_from_idea(article_id: int, idea_id: int, user_id: int) -> boo
         conn.commit()
         return cursor.rowcount > 0
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
 def get_articles_by_idea(idea_id: int, user_id: int) -> list[dict]:
@@ -714,7 +1006,89 @@ def get_articles_by_idea(idea_id: int, user_id: int) -> list[dict]:
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
     finally:
-        conn.close()
+        _release_connection(conn)
+
+
+def _fetch_idea_with_articles(cursor: sqlite3.Cursor, idea_id: int, user_id: int) -> dict | None:
+    """Запрос get_idea_with_articles() в рамках переданного курсора."""
+    cursor.execute(
+        """
+        SELECT i.name, a.id AS article_id, a.title
+        FROM ideas i
+        LEFT JOIN idea_articles ia ON ia.idea_id = i.id
+        LEFT JOIN articles a ON a.id = ia.article_id
+        WHERE i.id = ? AND i.user_id = ?
+        ORDER BY ia.added_at DESC
+        """,
+        (idea_id, user_id),
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    return {
+        'id': idea_id,
+        'name': rows[0]['name'],
+        'articles': [
+            {'id': row['article_id'], 'title': row['title']}
+            for row in rows if row['article_id'] is not None
+        ],
+    }
+
+
+def get_idea_with_articles(idea_id: int, user_id: int) -> dict | None:
+    """
+    Получает название идеи и список её статей одним запросом (LEFT JOIN).
+
+    Заменяет пару get_idea_by_id() + get_articles_by_idea() там, где от статей
+    нужны только ID и заголовок.
+
+    Args:
+        idea_id: ID идеи
+        user_id: ID пользователя для проверки владения
+
+    Returns:
+        {'id', 'name', 'articles': [{'id', 'title'}, ...]} — статьи от новых привязок
+        к старым; None если идея не найдена или принадлежит другому пользователю
+    """
+    conn = _get_connection()
+    try:
+        return _fetch_idea_with_articles(conn.cursor(), idea_id, user_id)
+    finally:
+        _release_connection(conn)
+
+
+def unlink_and_fetch_articles(article_id: int, idea_id: int, user_id: int) -> tuple[bool, dict | None]:
+    """
+    Отвязывает статью от идеи и возвращает обновлённый список статей идеи.
+
+    Проверка владения входит в DELETE, список читается тем же подключением
+    после commit — вместо unlink_article_from_idea() и отдельного
+    get_idea_with_articles().
+
+    Args:
+        article_id: ID статьи
+        idea_id: ID идеи
+        user_id: ID пользователя для проверки владения
+
+    Returns:
+        (удалена ли привязка, результат как у get_idea_with_articles())
+    """
+    conn = _get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            DELETE FROM idea_articles
+            WHERE idea_id = ? AND article_id = ?
+              AND idea_id IN (SELECT id FROM ideas WHERE user_id = ?)
+            """,
+            (idea_id, article_id, user_id),
+        )
+        conn.commit()
+        unlinked = cursor.rowcount > 0
+        return unlinked, _fetch_idea_with_articles(cursor, idea_id, user_id)
+    finally:
+        _release_connection(conn)
 
 
 def get_ideas_by_article(article_id: int, user_id: int) -> list[dict]:
@@ -744,7 +1118,41 @@ def get_ideas_by_article(article_id: int, user_id: int) -> list[dict]:
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
     finally:
-        conn.close()
+        _release_connection(conn)
+
+
+def get_article_ideas_map(user_id: int) -> dict[int, list[dict]]:
+    """
+    Получает идеи пользователя, сгруппированные по привязанным статьям.
+
+    Заменяет вызов get_ideas_by_article() для каждой статьи списка одним запросом.
+
+    Args:
+        user_id: ID пользователя
+
+    Returns:
+        Словарь {article_id: [{'id', 'name'}, ...]}, идеи статьи — от новых привязок к старым.
+        Статей без идей в словаре нет.
+    """
+    conn = _get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT ia.article_id, i.id, i.name
+            FROM idea_articles ia
+            JOIN ideas i ON i.id = ia.idea_id
+            WHERE i.user_id = ?
+            ORDER BY ia.added_at DESC
+            """,
+            (user_id,),
+        )
+        ideas_map: dict[int, list[dict]] = {}
+        for article_id, idea_id, name in cursor.fetchall():
+            ideas_map.setdefault(article_id, []).append({'id': idea_id, 'name': name})
+        return ideas_map
+    finally:
+        _release_connection(conn)
 
 
 def get_user_articles(user_id: int) -> list[dict]:
@@ -759,7 +1167,7 @@ def get_user_articles(user_id: int) -> list[dict]:
         )
         return [dict(row) for row in cursor.fetchall()]
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
 # ========================
@@ -780,11 +1188,12 @@ def update_idea_md(idea_id: int, user_id: int, md_content: str) -> bool:
         )
         conn.commit()
         if cursor.rowcount > 0:
+            _idea_cache_invalidate((idea_id, user_id))
             _save_idea_md_file(idea_id, md_content)
             return True
         return False
     finally:
-        conn.close()
+        _release_connection(conn)
 
 
 def get_idea_md(idea_id: int, user_id: int) -> str | None:
@@ -799,7 +1208,76 @@ def get_idea_md(idea_id: int, user_id: int) -> str | None:
         row = cursor.fetchone()
         return row['generated_md'] if row else None
     finally:
-        conn.close()
+        _release_connection(conn)
+
+
+def get_user_model_config(user_id: int, kind: str) -> dict | None:
+    """
+    Получает сохранённый выбор модели пользователя.
+
+    Args:
+        user_id: Telegram user_id
+        kind: Назначение модели ('summary' — конспекты, 'md' — .md описания идей)
+
+    Returns:
+        Словарь {'provider': str, 'model': str} или None, если пользователь не выбирал модель
+    """
+    conn = _get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT provider, model FROM user_model_config WHERE user_id = ? AND kind = ?",
+            (user_id, kind),
+        )
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    finally:
+        _release_connection(conn)
+
+
+def get_user_model_configs(user_id: int) -> dict[str, dict]:
+    """
+    Получает выбор моделей пользователя для всех назначений одним запросом.
+
+    Args:
+        user_id: Telegram user_id
+
+    Returns:
+        Словарь {kind: {'provider': str, 'model': str}}; назначения без выбора отсутствуют
+    """
+    conn = _get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT kind, provider, model FROM user_model_config WHERE user_id = ?",
+            (user_id,),
+        )
+        return {row['kind']: {'provider': row['provider'], 'model': row['model']} for row in cursor.fetchall()}
+    finally:
+        _release_connection(conn)
+
+
+def set_user_model_config(user_id: int, kind: str, provider: str, model: str) -> None:
+    """
+    Сохраняет выбор модели пользователя (перезаписывает предыдущий).
+
+    Args:
+        user_id: Telegram user_id
+        kind: Назначение модели ('summary' или 'md')
+        provider: Провайдер ('ollama', 'openai', 'openrouter')
+        model: Название модели
+    """
+    conn = _get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT OR REPLACE INTO user_model_config (user_id, kind, provider, model) VALUES (?, ?, ?, ?)",
+            (user_id, kind, provider, model),
+        )
+        conn.commit()
+        logger.debug("Модель пользователя сохранена: user_id=%s, kind=%s, model=%s", user_id, kind, model)
+    finally:
+        _release_connection(conn)
 
 
 def _save_idea_md_file(idea_id: int, md_content: str) -> None:
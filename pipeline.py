@@ -25,23 +25,16 @@ import time
 logger = logging.getLogger(__name__)
 
 # Импортируем наши модули
-from scraper import get_article
+from scraper import detect_source, get_article
 from summarizer import generate_summary, DEFAULT_MODEL, DEFAULT_PROVIDER
-from database import init_db, article_exists, save_article, update_article, get_article_by_url
+from database import init_db, find_article_id_by_url, save_article, update_article
 
 # Публичный API модуля
-__all__ = ['process_article', 'ensure_directories', 'save_article_to_db']
+__all__ = ['process_article', 'ensure_directories', 'save_article_to_db', 'is_supported_url', 'get_source_name']
 
 # Конфигурация путей
 DATA_DIR: str = 'data'
 
-# Поддерживаемые источники
-SUPPORTED_SOURCES: dict[str, str] = {
-    'habr.com': 'habr',
-    'github.com': 'github',
-    'infostart.ru': 'infostart',
-}
-
 
 def ensure_directories() -> None:
     """
@@ -66,23 +59,23 @@ def is_supported_url(url: str) -> bool:
     Returns:
         True если источник поддерживается, иначе False.
     """
-    return any(source in url for source in SUPPORTED_SOURCES)
+    return get_source_name(url) != 'unknown'
 
 
 def get_source_name(url: str) -> str:
     """
-    Определяет название источника по URL.
+    Определяет название источника по домену URL.
+
+    Использует scraper.detect_source(), поэтому совпадает с выбором парсера
+    в get_article(url) без явного source.
 
     Args:
         url: URL статьи или репозитория.
 
     Returns:
-        Название источника ('habr', 'github') или 'unknown'.
+        Название источника ('habr', 'github', 'infostart') или 'unknown'.
     """
-    for domain, name in SUPPORTED_SOURCES.items():
-        if domain in url:
-            return name
-    return 'unknown'
+    return detect_source(url)
 
 
 def process_article(
@@ -91,6 +84,7 @@ def process_article(
     provider: str = DEFAULT_PROVIDER,
     user_id: int | None = None,
     skip_cache: bool = False,
+    source: str | None = None,
 ) -> tuple[str, dict] | None:
     """
     Основная функция пайплайна: URL → Конспект.
@@ -104,17 +98,21 @@ def process_article(
         provider: Провайдер ('ollama', 'openai', 'openrouter').
         user_id: Telegram user_id для привязки статьи.
         skip_cache: Пропустить проверку кеша (для принудительной перегенерации).
+        source: Источник, уже определённый вызывающим кодом через get_source_name().
+            Если не передан, определяется здесь.
 
     Returns:
         Кортеж (summary: str, article_data: dict) или None при ошибке.
     """
     start_time = time.perf_counter()
 
-    if not is_supported_url(url):
+    if source is None:
+        source = get_source_name(url)
+    if source == 'unknown':
         logger.warning("Неподдерживаемый источник: %s", url)
         return None
 
-    article_data = get_article(url)
+    article_data = get_article(url, source=source)
 
     if 'error' in article_data:
         logger.error("Ошибка парсинга: %s", article_data["error"])
@@ -158,16 +156,14 @@ def save_article_to_db(
     Returns:
         ID сохранённой статьи или None если статья уже существует.
     """
-    # Проверяем, есть ли уже запись
+    # Проверяем, есть ли уже запись: один запрос только за ID, без чтения всей статьи
     check_url = url or article_data.get('url')
-    if check_url and article_exists(check_url):
-        # Статья уже существует - возвращаем ID
-        existing = get_article_by_url(check_url)
-        if existing:
-            # Обновляем конспект
-            update_article(url=check_url, summary=summary, model=model)
-            logger.info("Обновлено в БД: article_id=%d", existing["id"])
-            return existing['id']
+    existing_id = find_article_id_by_url(check_url) if check_url else None
+    if existing_id is not None:
+        # Статья уже существует - обновляем конспект и возвращаем ID
+        update_article(url=check_url, summary=summary, model=model)
+        logger.info("Обновлено в БД: article_id=%d", existing_id)
+        return existing_id
 
     # Создаём новую запись
     article_id = save_article(
@@ -194,7 +190,14 @@ def main() -> None:
     url = sys.argv[1]
     model = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_MODEL
     provider = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_PROVIDER
-    process_article(url, model=model, provider=provider)
+    result = process_article(url, model=model, provider=provider)
+    if result is None:
+        print("Не удалось обработать статью")
+        sys.exit(1)
+
+    # Конспект возвращается из process_article() в памяти — выводим его напрямую
+    summary, _article_data = result
+    print(summary)
 
 
 if __name__ == '__main__':
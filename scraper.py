@@ -19,6 +19,7 @@ Example:
 import logging
 import re
 import time
+from urllib.parse import urlsplit
 
 import requests
 from bs4 import BeautifulSoup
@@ -27,20 +28,60 @@ from bs4 import BeautifulSoup
 logger = logging.getLogger(__name__)
 
 # Публичный API модуля
-__all__ = ['get_article', 'get_structured_habr_article']
+__all__ = ['get_article', 'get_structured_habr_article', 'detect_source', 'SUPPORTED_SOURCES']
 
 # Константы
 MAX_CONTENT_LENGTH: int = 8000
 TIMEOUT_SECONDS: int = 10
 USER_AGENT: str = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
 
+# Поддерживаемые источники: домен → имя парсера.
+# Единственное место, где перечислены домены; pipeline.py и bot.py берут их отсюда.
+SUPPORTED_SOURCES: dict[str, str] = {
+    'habr.com': 'habr',
+    'github.com': 'github',
+    'infostart.ru': 'infostart',
+}
+# Суффиксы поддоменов ('.habr.com' → 'habr'), вычисляются один раз при импорте
+_SUBDOMAIN_SUFFIXES: tuple[tuple[str, str], ...] = tuple(
+    ('.' + domain, name) for domain, name in SUPPORTED_SOURCES.items()
+)
 
-def get_article(url: str) -> dict:
+
+def detect_source(url: str) -> str:
+    """
+    Определяет источник по hostname URL.
+
+    Сравнивается только hostname, поэтому домен в пути или query-строке
+    (например, ?ref=habr.com) не считается поддерживаемым источником.
+
+    Args:
+        url: URL статьи или репозитория.
+
+    Returns:
+        Название источника ('habr', 'github', 'infostart') или 'unknown'.
+    """
+    try:
+        host = urlsplit(url.strip()).hostname or ''
+    except ValueError:
+        return 'unknown'
+    name = SUPPORTED_SOURCES.get(host)
+    if name:
+        return name
+    for suffix, name in _SUBDOMAIN_SUFFIXES:
+        if host.endswith(suffix):
+            return name
+    return 'unknown'
+
+
+def get_article(url: str, source: str | None = None) -> dict:
     """
     Роутер: определяет источник и вызывает соответствующий парсер.
 
     Args:
         url: URL статьи или репозитория.
+        source: Уже определённый источник ('habr' | 'github' | 'infostart').
+            Если не передан, определяется по URL.
 
     Returns:
         Словарь с данными статьи. Гарантированные поля:
@@ -56,12 +97,14 @@ def get_article(url: str) -> dict:
     """
     start_time = time.perf_counter()
     url = url.strip()
+    if source is None:
+        source = detect_source(url)
 
-    if 'habr.com' in url:
+    if source == 'habr':
         result = _parse_habr(url)
-    elif 'github.com' in url:
+    elif source == 'github':
         result = _parse_github(url)
-    elif 'infostart.ru' in url:
+    elif source == 'infostart':
         result = _parse_infostart(url)
     else:
         result = {'error': f'Источник не поддерживается: {url}'}
@@ -19,6 +19,7 @@ Example:
 import logging
 import os
 import time
+from collections.abc import Iterator
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +50,7 @@ __all__ = [
     'DEFAULT_MD_MODEL',
     'DEFAULT_MD_PROVIDER',
     'generate_idea_md',
+    'generate_idea_md_stream',
     'revise_idea_md',
 ]
 
@@ -68,6 +70,9 @@ DEFAULT_MODEL: str = 'gemma3:12b'
 DEFAULT_MD_PROVIDER: str = 'openai'
 DEFAULT_MD_MODEL: str = 'gpt-4'
 
+# Сколько секунд доверять успешной проверке доступности модели
+MODEL_CHECK_TTL: float = 60.0
+
 
 # =============================================================================
 # ПРОМПТЫ ДЛЯ ХАБРА
@@ -424,14 +429,96 @@ def _generate(
     Raises:
         ValueError: Если провайдер не поддерживается.
     """
-    if provider == 'ollama':
-        return _generate_with_ollama(system_prompt, user_prompt, model)
-    elif provider == 'openai':
-        return _generate_with_openai(system_prompt, user_prompt, model)
-    elif provider == 'openrouter':
-        return _generate_with_openrouter(system_prompt, user_prompt, model)
-    else:
-        raise ValueError(f'Неподдерживаемый провайдер: {provider}')
+    try:
+        if provider == 'ollama':
+            return _generate_with_ollama(system_prompt, user_prompt, model)
+        elif provider == 'openai':
+            return _generate_with_openai(system_prompt, user_prompt, model)
+        elif provider == 'openrouter':
+            return _generate_with_openrouter(system_prompt, user_prompt, model)
+        else:
+            raise ValueError(f'Неподдерживаемый провайдер: {provider}')
+    except Exception:
+        # Модель упала — следующая проверка доступности должна идти к провайдеру
+        _model_check_cache.pop((model, provider), None)
+        raise
+
+
+# =============================================================================
+# ПОТОКОВАЯ ГЕНЕРАЦИЯ
+# =============================================================================
+
+
+def _stream_with_ollama(system_prompt: str, user_prompt: str, model: str) -> Iterator[str]:
+    """Потоковый вариант _generate_with_ollama(): отдаёт текст фрагментами по мере генерации."""
+    logger.info('Отправляю потоковый запрос в Ollama: model=%s, context_length=%d',
+                model, len(system_prompt) + len(user_prompt))
+    stream = ollama.chat(
+        model=model,
+        messages=[
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_prompt},
+        ],
+        options={
+            'temperature': 0.3,
+            'num_predict': 1000,
+        },
+        stream=True,
+    )
+    for part in stream:
+        content = part['message']['content']
+        if content:
+            yield content
+
+
+def _stream_with_openai_client(
+    api_client: OpenAI,
+    system_prompt: str,
+    user_prompt: str,
+    model: str,
+) -> Iterator[str]:
+    """Потоковая генерация через OpenAI-совместимый клиент (OpenAI или OpenRouter)."""
+    stream = api_client.chat.completions.create(
+        model=model,
+        messages=[
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_prompt},
+        ],
+        temperature=0.3,
+        max_tokens=1000,
+        timeout=30,
+        stream=True,
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _generate_stream(
+    system_prompt: str,
+    user_prompt: str,
+    model: str,
+    provider: str,
+) -> Iterator[str]:
+    """
+    Потоковый вариант _generate(): выбирает провайдера и отдаёт текст фрагментами.
+
+    Raises:
+        ValueError: Если провайдер не поддерживается.
+    """
+    try:
+        if provider == 'ollama':
+            yield from _stream_with_ollama(system_prompt, user_prompt, model)
+        elif provider == 'openai':
+            yield from _stream_with_openai_client(client, system_prompt, user_prompt, model)
+        elif provider == 'openrouter':
+            yield from _stream_with_openai_client(openrouter_client, system_prompt, user_prompt, model)
+        else:
+            raise ValueError(f'Неподдерживаемый провайдер: {provider}')
+    except Exception:
+        # Модель упала — следующая проверка доступности должна идти к провайдеру
+        _model_check_cache.pop((model, provider), None)
+        raise
 
 
 # =============================================================================
@@ -439,10 +526,44 @@ def _generate(
 # =============================================================================
 
 
-def check_model_availability(model: str, provider: str) -> tuple[bool, str | None]:
+# Время последней успешной проверки: {(model, provider): time.monotonic()}
+_model_check_cache: dict[tuple[str, str], float] = {}
+
+
+def check_model_availability(model: str, provider: str, force: bool = False) -> tuple[bool, str | None]:
     """
     Проверяет доступность модели у указанного провайдера.
 
+    Успешный результат кешируется на MODEL_CHECK_TTL секунд, чтобы не делать
+    сетевой запрос к провайдеру на каждую ссылку. Неудачи не кешируются:
+    после запуска Ollama или исправления ключа модель сразу становится доступной.
+
+    Args:
+        model: Название модели.
+        provider: Провайдер ('ollama', 'openai', 'openrouter').
+        force: Игнорировать кеш и проверить модель запросом к провайдеру
+            (например, при явном выборе модели пользователем).
+
+    Returns:
+        Кортеж (доступна ли модель, сообщение об ошибке или None).
+    """
+    key = (model, provider)
+    checked_at = _model_check_cache.get(key)
+    if not force and checked_at is not None and time.monotonic() - checked_at < MODEL_CHECK_TTL:
+        return True, None
+
+    is_available, error_message = _probe_model_availability(model, provider)
+    if is_available:
+        _model_check_cache[key] = time.monotonic()
+    else:
+        _model_check_cache.pop(key, None)
+    return is_available, error_message
+
+
+def _probe_model_availability(model: str, provider: str) -> tuple[bool, str | None]:
+    """
+    Делает реальный запрос к провайдеру для проверки модели.
+
     Args:
         model: Название модели.
         provider: Провайдер ('ollama', 'openai', 'openrouter').
@@ -602,6 +723,33 @@ def generate_idea_md(
     return result
 
 
+def generate_idea_md_stream(
+    idea_name: str,
+    idea_description: str,
+    model: str = DEFAULT_MD_MODEL,
+    provider: str = DEFAULT_MD_PROVIDER,
+) -> Iterator[str]:
+    """
+    Потоковый вариант generate_idea_md(): отдаёт .md фрагментами по мере генерации.
+
+    Склейка всех фрагментов равна результату generate_idea_md().
+    """
+    start_time = time.perf_counter()
+    user_prompt = IDEA_MD_USER_PROMPT_TEMPLATE.format(
+        idea_name=idea_name,
+        idea_description=idea_description or '(нет описания)',
+    )
+    length = 0
+    for piece in _generate_stream(IDEA_MD_SYSTEM_PROMPT, user_prompt, model, provider):
+        length += len(piece)
+        yield piece
+    elapsed = time.perf_counter() - start_time
+    logger.info(
+        'generate_idea_md_stream completed: model=%s, provider=%s, idea=%s, length=%d, time=%.2fs',
+        model, provider, idea_name[:50], length, elapsed,
+    )
+
+
 def revise_idea_md(
     current_md: str,
     feedback: str,